@@ -0,0 +1,28 @@
+"""
+Gunicorn settings for the production container. Every value can be overridden with
+an environment variable, e.g. GUNICORN_WORKERS=4 GUNICORN_THREADS=8.
+"""
+import multiprocessing
+import os
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# Pre-forked worker processes, each serving requests on a small thread pool. Most of a
+# request is spent waiting on the database, so threads are cheaper than extra processes.
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+# Keep nginx's upstream connections open between requests
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 75))
+
+# Recycle workers now and then so a slow leak cannot grow forever
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
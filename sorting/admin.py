@@ -1,6 +1,57 @@
+from datetime import datetime, time
+
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.db import connections, transaction
+from django.db.models import Q, QuerySet
+from django.utils import timezone
 from django.utils.html import format_html
-from .models import Socket, Bag, SortedBag, SortingPerson, BagType, BagSubtype
+from .catalog import bump_catalog_version, get_catalog
+from .models import Socket, Bag, SortedBag, SortingPerson, BagType, BagSubtype, DailyProduction
+from .pagination import EstimatedCountPaginator
+from .rollups import ROLLUP_FIELDS, record_bags
+
+
+class CatalogFieldListFilter(admin.RelatedFieldListFilter):
+    """
+    Related filter listing the active sockets, bag types or subtypes of the in-process
+    catalog instead of querying them on every page load
+    """
+    catalog_records = {Socket: 'sockets', BagType: 'bag_types', BagSubtype: 'subtypes'}
+
+    def field_choices(self, field, request, model_admin):
+        records = getattr(get_catalog(), self.catalog_records[field.related_model])
+        return [(record.pk, str(record)) for record in records]
+
+
+class RollupDatesQuerySet(QuerySet):
+    """
+    Bag queryset whose received_at dates can come from the DailyProduction rollup, so the
+    admin date hierarchy does not run a DISTINCT over every bag of the year or month
+    """
+    rollup_days = None
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None):
+        if self.rollup_days is None or field_name != 'received_at':
+            return super().datetimes(field_name, kind, order, tzinfo)
+        tzinfo = tzinfo or timezone.get_current_timezone()
+        return [
+            timezone.make_aware(datetime.combine(day, time.min), tzinfo)
+            for day in self.rollup_days.dates('day', kind, order)
+        ]
+
+
+class BagChangeList(ChangeList):
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        field_generic = f'{self.date_hierarchy}__'
+        # Only while the date hierarchy is the sole filter do the rollup's days match the bags
+        if not self.query and all(param.startswith(field_generic) for param in self.get_filters_params()):
+            queryset.rollup_days = DailyProduction.objects.filter(bag_count__gt=0, **{
+                f'day__{part}': self.params[f'{field_generic}{part}']
+                for part in ('year', 'month', 'day') if f'{field_generic}{part}' in self.params
+            })
+        return queryset
 
 
 @admin.register(BagType)
@@ -13,7 +64,8 @@ class BagTypeAdmin(admin.ModelAdmin):
     
     def change_source_to_in(self, request, queryset):
         """Change selected BagType objects' bag_source to IN"""
-        updated = queryset.update(bag_source='IN')
+        updated = queryset.update(bag_source='IN', updated_at=timezone.now())
+        bump_catalog_version()
         self.message_user(
             request,
             f'Pomyślnie zmieniono źródło {updated} typów worków na WEJŚCIE.'
@@ -22,7 +74,8 @@ class BagTypeAdmin(admin.ModelAdmin):
     
     def change_source_to_out(self, request, queryset):
         """Change selected BagType objects' bag_source to OUT"""
-        updated = queryset.update(bag_source='OUT')
+        updated = queryset.update(bag_source='OUT', updated_at=timezone.now())
+        bump_catalog_version()
         self.message_user(
             request,
             f'Pomyślnie zmieniono źródło {updated} typów worków na WYJŚCIE.'
@@ -78,8 +131,17 @@ class SortingPersonAdmin(admin.ModelAdmin):
 @admin.register(Bag)
 class BagAdmin(admin.ModelAdmin):
     list_display = ('bag_id', 'socket', 'bag_type', 'bag_subtype', 'quality_grade', 'item_count', 'weight_kg', 'extra', 'is_processed', 'sorting_person', 'received_at')
-    list_filter = ('bag_type', 'bag_subtype', 'quality_grade', 'extra', 'is_processed', 'received_at', 'socket')
-    search_fields = ('bag_id', 'notes')
+    list_filter = (
+        ('bag_type', CatalogFieldListFilter), ('bag_subtype', CatalogFieldListFilter),
+        'quality_grade', 'extra', 'is_processed', ('socket', CatalogFieldListFilter),
+    )
+    list_select_related = ('socket', 'bag_type', 'bag_subtype__bag_type', 'sorting_person')
+    date_hierarchy = 'received_at'
+    search_fields = ('bag_id',)
+    search_help_text = 'Początek ID worka'
+    # The table holds millions of rows: estimate the total instead of counting it twice
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = ('received_at', 'processed_at', 'updated_at')
     raw_id_fields = ('socket', 'sorting_person', 'bag_type', 'bag_subtype')
     actions = ['mark_as_extra', 'mark_as_standard']
@@ -102,7 +164,7 @@ class BagAdmin(admin.ModelAdmin):
     
     def mark_as_extra(self, request, queryset):
         """Mark selected bags as extra"""
-        updated = queryset.update(extra=True)
+        updated = self.set_extra(queryset, True)
         self.message_user(
             request,
             f'Pomyślnie oznaczono {updated} worków jako Dodatkowe.'
@@ -111,13 +173,45 @@ class BagAdmin(admin.ModelAdmin):
     
     def mark_as_standard(self, request, queryset):
         """Mark selected bags as standard (not extra)"""
-        updated = queryset.update(extra=False)
+        updated = self.set_extra(queryset, False)
         self.message_user(
             request,
             f'Pomyślnie oznaczono {updated} worków jako Standardowe (nie dodatkowe).'
         )
     mark_as_standard.short_description = "Oznacz wybrane worki jako Standardowe"
 
+    def set_extra(self, queryset, extra):
+        """
+        Set ``extra`` on the selected bags. update() bypasses the signals that keep the daily
+        rollup current, so the bags that change are moved between rollup rows here.
+        """
+        with transaction.atomic():
+            changed = list(queryset.exclude(extra=extra).only(*ROLLUP_FIELDS))
+            updated = queryset.update(extra=extra)
+            record_bags(changed, sign=-1)
+            for bag in changed:
+                bag.extra = extra
+            record_bags(changed)
+        return updated
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return RollupDatesQuerySet(queryset.model, queryset.query, using=queryset._db)
+
+    def get_changelist(self, request, **kwargs):
+        return BagChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        """Prefix search on bag_id that seeks its unique index instead of scanning the table"""
+        term = search_term.strip().upper()
+        if not term:
+            return queryset, False
+        lookup = Q(bag_id__startswith=term)
+        if connections[queryset.db].vendor == 'sqlite':
+            # SQLite's LIKE ignores case, so only this range can use the (binary) bag_id index
+            lookup &= Q(bag_id__gte=term, bag_id__lt=term[:-1] + chr(ord(term[-1]) + 1))
+        return queryset.filter(lookup), False
+
 
 @admin.register(SortedBag)
 class SortedBagAdmin(admin.ModelAdmin):
@@ -142,3 +236,17 @@ class SortedBagAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(DailyProduction)
+class DailyProductionAdmin(admin.ModelAdmin):
+    list_display = ('day', 'socket', 'bag_type', 'bag_subtype', 'extra', 'sorting_person', 'bag_count', 'total_weight_kg')
+    list_filter = ('day', 'socket', 'extra')
+    date_hierarchy = 'day'
+    list_select_related = ('socket', 'bag_type', 'bag_subtype', 'sorting_person')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,128 @@
+import hashlib
+import secrets
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+# Crockford base32: no I, L, O or U, so IDs can be read off a label without ambiguity
+CROCKFORD_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+
+
+def encode_base32(value, length):
+    chars = []
+    for _ in range(length):
+        value, remainder = divmod(value, 32)
+        chars.append(CROCKFORD_ALPHABET[remainder])
+    return ''.join(reversed(chars))
+
+
+class BagIdGenerator:
+    """Base class of the generators selectable with the BAG_ID_GENERATOR setting"""
+
+    def generate(self, socket=None):
+        return self.generate_batch(1, socket)[0]
+
+    def generate_batch(self, count, socket=None):
+        raise NotImplementedError
+
+
+class RandomBagIdGenerator(BagIdGenerator):
+    """Legacy ``BAG_XXXXXXXX`` IDs from 8 random hex characters, kept for compatibility"""
+
+    def generate_batch(self, count, socket=None):
+        return [f"BAG_{uuid.uuid4().hex[:8].upper()}" for _ in range(count)]
+
+
+class TimeOrderedBagIdGenerator(BagIdGenerator):
+    """
+    ULID-style ``BAG_<timestamp>-<random>`` IDs: a 48-bit millisecond timestamp and 40
+    random bits, both Crockford base32. Within a process the random part is incremented
+    instead of redrawn, so IDs are strictly increasing and new rows are appended at the
+    right edge of the bag_id index instead of scattered across it.
+    """
+    prefix = 'BAG_'
+    random_bits = 40
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._last_random = 0
+
+    def generate_batch(self, count, socket=None):
+        ids = []
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                # Leave headroom so a burst within one millisecond never overflows
+                self._last_random = secrets.randbits(self.random_bits - 1)
+            for _ in range(count):
+                self._last_random += 1
+                if self._last_random >= 1 << self.random_bits:
+                    self._last_ms += 1
+                    self._last_random = secrets.randbits(self.random_bits - 1)
+                ids.append(
+                    f"{self.prefix}{encode_base32(self._last_ms, 10)}-{encode_base32(self._last_random, 8)}"
+                )
+        return ids
+
+
+class SocketSequenceBagIdGenerator(BagIdGenerator):
+    """
+    ``<socket_id>-<YYMMDD>-<NNNNN>`` IDs numbered per socket and day. Numbers are
+    reserved in blocks from BagIdSequence with a single atomic UPDATE, so they are
+    unique by construction and short enough to be read out on the floor. A socket_id too
+    long for Bag.bag_id is shortened to its start and a hash of the whole.
+    """
+
+    @staticmethod
+    def socket_prefix(socket_id, room):
+        if len(socket_id) <= room:
+            return socket_id
+        digest = hashlib.sha1(socket_id.encode()).hexdigest()[:6].upper()
+        return f"{socket_id[:room - 7]}~{digest}"
+
+    def generate_batch(self, count, socket=None):
+        from .models import Bag, BagIdSequence
+
+        if socket is None:
+            raise ValueError('SocketSequenceBagIdGenerator requires a socket')
+
+        day = timezone.localdate()
+        with transaction.atomic():
+            sequence, _ = BagIdSequence.objects.get_or_create(socket=socket, day=day)
+            BagIdSequence.objects.filter(pk=sequence.pk).update(last_value=F('last_value') + count)
+            last_value = BagIdSequence.objects.values_list('last_value', flat=True).get(pk=sequence.pk)
+
+        suffix_length = len(f"-{day:%y%m%d}-{last_value:05d}")
+        prefix = f"{self.socket_prefix(socket.socket_id, Bag._meta.get_field('bag_id').max_length - suffix_length)}-{day:%y%m%d}"
+        return [f"{prefix}-{number:05d}" for number in range(last_value - count + 1, last_value + 1)]
+
+
+_generators = {}
+
+
+def get_bag_id_generator():
+    """Return the shared instance of the generator configured in BAG_ID_GENERATOR"""
+    path = settings.BAG_ID_GENERATOR
+    if path not in _generators:
+        _generators[path] = import_string(path)()
+    return _generators[path]
+
+
+def assign_bag_ids(bags):
+    """Fill in ``bag_id`` on unsaved bags, with one generator call per socket"""
+    generator = get_bag_id_generator()
+    bags_by_socket = {}
+    for bag in bags:
+        bags_by_socket.setdefault(bag.socket, []).append(bag)
+    for socket, socket_bags in bags_by_socket.items():
+        for bag, bag_id in zip(socket_bags, generator.generate_batch(len(socket_bags), socket)):
+            bag.bag_id = bag_id
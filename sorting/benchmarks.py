@@ -0,0 +1,175 @@
+"""
+Requests measured by the benchmark_urls command and guarded by the query budget tests.
+Every URL of sorting/urls.py is covered, plus a full bag entry through the wizard.
+"""
+import json
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from .models import Socket, BagType, Bag
+
+
+BENCHMARK_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'},
+    'wizard': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-wizard'},
+    'idempotency': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-idempotency'},
+}
+
+
+@contextmanager
+def benchmark_database(on_disk=False):
+    """
+    Run the block against a throwaway test database and private caches, so the data, bag
+    ID sequences, shared counters and catalog version of the running app stay untouched.
+    With ``on_disk`` a SQLite test database is a file next to the real one rather than in
+    memory, so that commits cost what they do in production.
+    """
+    test_settings = connection.settings_dict['TEST']
+    if on_disk and connection.vendor == 'sqlite' and not test_settings['NAME']:
+        test_settings['NAME'] = f"{connection.settings_dict['NAME']}.benchmark"
+    setup_test_environment()
+    runner = DiscoverRunner(verbosity=0, interactive=False)
+    old_config = runner.setup_databases()
+    try:
+        with override_settings(CACHES=BENCHMARK_CACHES):
+            yield
+    finally:
+        runner.teardown_databases(old_config)
+        teardown_test_environment()
+
+
+class QueryCounter:
+    """Database execute wrapper counting queries, whatever DEBUG and request signals do to the query log"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class BenchmarkRequest:
+    """One measured interaction: a list of (method, url, data) requests made in a row"""
+
+    def __init__(self, name, steps, budget):
+        self.name = name
+        self.steps = steps
+        self.budget = budget
+
+    def run(self, client):
+        for method, url, data in self.steps:
+            if method == 'POST_JSON':
+                response = client.post(url, json.dumps(data), content_type='application/json')
+            else:
+                response = getattr(client, method.lower())(url, data)
+            if response.status_code >= 400:
+                raise AssertionError(f'{self.name}: {method} {url} returned {response.status_code}')
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+
+
+def benchmark_requests():
+    """
+    The measured requests with their query budgets (queries per run, sessions and auth
+    included). Budgets must not depend on the amount of data: a list that starts
+    querying per row fails them as soon as there is more than a page of rows.
+    """
+    socket = Socket.objects.filter(socket_id='PL_1').first() or Socket.objects.first()
+    bag_type = BagType.objects.filter(socket=socket, is_active=True).first()
+    bag = Bag.objects.order_by('-received_at', '-id').first()
+    bag_record = {'socket_id': socket.id, 'bag_type_id': bag_type.id, 'weight_kg': '12.50'}
+    list_more = reverse('sorting:bag_list_more')
+
+    return [
+        BenchmarkRequest('dashboard', [('GET', reverse('sorting:dashboard'), {})], 2),
+        BenchmarkRequest('dashboard_events', [('GET', reverse('sorting:dashboard_events'), {})], 2),
+        BenchmarkRequest('socket_list', [('GET', reverse('sorting:socket_list'), {})], 3),
+        BenchmarkRequest('socket_detail', [('GET', reverse('sorting:socket_detail', args=[socket.id]), {})], 5),
+        BenchmarkRequest('bag_list', [('GET', reverse('sorting:bag_list'), {})], 4),
+        BenchmarkRequest('bag_list_pending', [('GET', reverse('sorting:bag_list'), {'status': 'pending'})], 4),
+        BenchmarkRequest('bag_list_bag_type', [('GET', reverse('sorting:bag_list'), {'bag_type': bag_type.id})], 4),
+        BenchmarkRequest('bag_list_more', [('GET', list_more, {})], 3),
+        BenchmarkRequest('bag_export_csv', [('GET', reverse('sorting:bag_export'), {'format': 'csv'})], 3),
+        BenchmarkRequest('bag_export_xlsx', [('GET', reverse('sorting:bag_export'), {'format': 'xlsx'})], 3),
+        BenchmarkRequest('bag_detail', [('GET', reverse('sorting:bag_detail', args=[bag.id]), {})], 3),
+        BenchmarkRequest('personnel_list', [('GET', reverse('sorting:personnel_list'), {})], 5),
+        BenchmarkRequest('sorted_bag_list', [('GET', reverse('sorting:sorted_bag_list'), {})], 3),
+        BenchmarkRequest('sorted_bag_export', [('GET', reverse('sorting:sorted_bag_export'), {})], 3),
+        BenchmarkRequest('bag_search', [('GET', reverse('sorting:bag_search'), {'q': bag.bag_id[4:10]})], 4),
+        BenchmarkRequest('bag_entry_sw', [('GET', reverse('sorting:bag_entry_sw'), {})], 0),
+        BenchmarkRequest('catalog', [('GET', reverse('sorting:catalog'), {})], 2),
+        BenchmarkRequest('quick_bag_entry', [('GET', reverse('sorting:quick_bag_entry'), {})], 2),
+        BenchmarkRequest('quick_bag_entry_post', [('POST', reverse('sorting:quick_bag_entry'), bag_record)], 6),
+        BenchmarkRequest('bag_bulk_create', [
+            ('POST_JSON', reverse('sorting:bag_bulk_create'), {'bags': [bag_record] * 20}),
+        ], 7),
+        BenchmarkRequest('settings', [('GET', reverse('sorting:settings'), {})], 5),
+        BenchmarkRequest('update_order', [
+            ('POST', reverse('sorting:update_order'), {
+                'model_type': 'socket',
+                'order[]': list(Socket.objects.order_by('order', 'socket_id').values_list('id', flat=True)),
+            }),
+        ], 5),
+        BenchmarkRequest('performance', [('GET', reverse('sorting:performance'), {})], 2),
+        BenchmarkRequest('admin_bag_list', [('GET', reverse('admin:sorting_bag_changelist'), {})], 8),
+        BenchmarkRequest('admin_bag_search', [
+            ('GET', reverse('admin:sorting_bag_changelist'), {'q': bag.bag_id[:8], 'is_processed__exact': 0}),
+        ], 6),
+        BenchmarkRequest('scale_reading', [
+            ('POST', reverse('sorting:step1_socket_selection'), {'socket': socket.id}),
+            ('POST', reverse('sorting:step2_bagtype_selection'), {'bag_type': bag_type.id}),
+            ('GET', reverse('sorting:scale_reading'), {}),
+        ], 6),
+        BenchmarkRequest('wizard', [
+            ('GET', reverse('sorting:step1_socket_selection'), {}),
+            ('POST', reverse('sorting:step1_socket_selection'), {'socket': socket.id}),
+            ('GET', reverse('sorting:step2_bagtype_selection'), {}),
+            ('POST', reverse('sorting:step2_bagtype_selection'), {'bag_type': bag_type.id}),
+            ('GET', reverse('sorting:step3_weight_entry'), {}),
+            ('POST', reverse('sorting:step3_weight_entry'), {'weight_kg': '12.50', 'notes': ''}),
+            ('GET', reverse('sorting:step4_summary'), {}),
+            ('POST', reverse('sorting:step4_summary'), {}),
+            ('POST', reverse('sorting:continue_or_finish'), {'action': 'finish'}),
+        ], 23),
+    ]
+
+
+def measure(request, client, repeat=5):
+    """
+    Run ``request`` once to warm the caches, once under tracemalloc for its queries and
+    peak memory, then ``repeat`` times for latency. Returns a dict of the results.
+    """
+    request.run(client)
+
+    queries = QueryCounter()
+    tracemalloc.start()
+    try:
+        with connection.execute_wrapper(queries):
+            request.run(client)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        request.run(client)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+
+    return {
+        'queries': queries.count,
+        'p50_ms': statistics.median(timings),
+        'p95_ms': timings[max(0, round(len(timings) * 0.95) - 1)],
+        'peak_kb': peak_memory / 1024,
+    }
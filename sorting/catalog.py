@@ -0,0 +1,165 @@
+import threading
+import time
+from types import MappingProxyType
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Socket, BagType, BagSubtype
+
+
+CATALOG_VERSION_KEY = 'sorting:catalog_version'
+
+
+def get_catalog_version():
+    """Current catalog version, shared by all processes through the default cache"""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, time.time_ns())
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """
+    Invalidate every process' catalog. Inside a transaction the version is bumped
+    immediately and again once it commits, so a process that reloads in between cannot
+    keep the pre-commit rows under the new version.
+    """
+    def bump():
+        try:
+            cache.incr(CATALOG_VERSION_KEY)
+        except ValueError:
+            cache.set(CATALOG_VERSION_KEY, time.time_ns())
+
+    bump()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(bump)
+
+
+class Catalog:
+    """
+    Immutable in-memory snapshot of the active sockets, bag types and subtypes, indexed
+    by id, code, socket and bag type. The records are model instances shared between
+    requests and must not be modified.
+    """
+
+    def __init__(self, version, sockets, bag_types, subtypes):
+        self.version = version
+        self.sockets = tuple(sockets)
+        self.sockets_by_id = MappingProxyType({socket.id: socket for socket in self.sockets})
+        self.sockets_by_code = MappingProxyType({socket.socket_id: socket for socket in self.sockets})
+
+        self.bag_types = tuple(bag_type for bag_type in bag_types if bag_type.socket_id in self.sockets_by_id)
+        self.bag_types_by_id = MappingProxyType({bag_type.id: bag_type for bag_type in self.bag_types})
+        self.bag_types_by_code = MappingProxyType({bag_type.code: bag_type for bag_type in self.bag_types})
+        bag_types_by_socket = {}
+        for bag_type in self.bag_types:
+            # Attach the related records so that following the relation never queries
+            bag_type.socket = self.sockets_by_id[bag_type.socket_id]
+            bag_types_by_socket.setdefault(bag_type.socket_id, []).append(bag_type)
+        self.bag_types_by_socket = MappingProxyType(
+            {socket_id: tuple(items) for socket_id, items in bag_types_by_socket.items()}
+        )
+
+        self.subtypes = tuple(subtype for subtype in subtypes if subtype.bag_type_id in self.bag_types_by_id)
+        self.subtypes_by_id = MappingProxyType({subtype.id: subtype for subtype in self.subtypes})
+        subtypes_by_bag_type = {}
+        for subtype in self.subtypes:
+            subtype.bag_type = self.bag_types_by_id[subtype.bag_type_id]
+            subtypes_by_bag_type.setdefault(subtype.bag_type_id, []).append(subtype)
+        self.subtypes_by_bag_type = MappingProxyType(
+            {bag_type_id: tuple(items) for bag_type_id, items in subtypes_by_bag_type.items()}
+        )
+
+        self._payload = None
+
+    @classmethod
+    def load(cls, version):
+        sockets = Socket.objects.filter(is_active=True).order_by('order', 'socket_id')
+        bag_types = BagType.objects.filter(is_active=True).order_by('order', 'name')
+        subtypes = BagSubtype.objects.filter(is_active=True).order_by('order', 'name')
+        return cls(version, sockets, bag_types, subtypes)
+
+    def bag_types_for(self, socket_id, bag_source=None):
+        bag_types = self.bag_types_by_socket.get(socket_id, ())
+        if bag_source:
+            bag_types = tuple(bag_type for bag_type in bag_types if bag_type.bag_source == bag_source)
+        return bag_types
+
+    def subtypes_for(self, bag_type_id):
+        return self.subtypes_by_bag_type.get(bag_type_id, ())
+
+    def has_subtypes(self, bag_type):
+        return bag_type.id in self.subtypes_by_bag_type
+
+    def find_socket(self, code):
+        """Find a socket by its code; ids go through sockets_by_id so a numeric code is never taken for one"""
+        return self.sockets_by_code.get(str(code))
+
+    def find_bag_type(self, code):
+        return self.bag_types_by_code.get(str(code))
+
+    def find_subtype(self, bag_type, value):
+        """Find a subtype of ``bag_type`` by code or name"""
+        value = str(value)
+        for subtype in self.subtypes_for(bag_type.id):
+            if value in (subtype.code, subtype.name):
+                return subtype
+        return None
+
+    def as_payload(self):
+        """The catalog as plain JSON-serialisable data, for clients that run the entry steps locally"""
+        if self._payload is None:
+            self._payload = {
+                'version': str(self.version),
+                'sockets': [
+                    {
+                        'id': socket.id,
+                        'code': socket.socket_id,
+                        'name': socket.socket_name,
+                        'color': socket.socket_color,
+                        'bag_sources': sorted({bag_type.bag_source for bag_type in self.bag_types_for(socket.id)}),
+                    }
+                    for socket in self.sockets
+                ],
+                'bag_types': [
+                    {
+                        'id': bag_type.id,
+                        'socket': bag_type.socket_id,
+                        'name': bag_type.name,
+                        'code': bag_type.code,
+                        'color': bag_type.color,
+                        'bag_source': bag_type.bag_source,
+                        'parameters': list(bag_type.parameter or []),
+                    }
+                    for bag_type in self.bag_types
+                ],
+                'subtypes': [
+                    {
+                        'id': subtype.id,
+                        'bag_type': subtype.bag_type_id,
+                        'name': subtype.name,
+                        'color': subtype.color,
+                    }
+                    for subtype in self.subtypes
+                ],
+            }
+        return self._payload
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """Return this process' catalog snapshot, reloading it once the shared version has moved on"""
+    global _catalog
+    version = get_catalog_version()
+    catalog = _catalog
+    if catalog is None or catalog.version != version:
+        with _catalog_lock:
+            if _catalog is None or _catalog.version != version:
+                _catalog = Catalog.load(version)
+            catalog = _catalog
+    return catalog
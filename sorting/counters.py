@@ -0,0 +1,78 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Socket, Bag, SortedBag, SortingPerson
+
+
+DASHBOARD_COUNTERS = (
+    'total_sockets', 'total_bags', 'processed_bags', 'pending_bags', 'sorted_bags', 'active_personnel',
+)
+# When the cached counters were last computed; they are recomputed DASHBOARD_COUNTERS_TTL later
+COMPUTED_AT = 'computed_at'
+
+
+def counter_key(name):
+    return f'sorting:dashboard_counters:{name}'
+
+
+def compute_dashboard_counters():
+    """
+    Compute dashboard counters. The total comes from the smallest Bag index and the
+    pending count from the partial index of pending bags, so neither reads the table.
+    """
+    total_bags = Bag.objects.count()
+    pending_bags = Bag.objects.filter(is_processed=False).count()
+    return {
+        'total_sockets': Socket.objects.filter(is_active=True).count(),
+        'total_bags': total_bags,
+        'processed_bags': total_bags - pending_bags,
+        'pending_bags': pending_bags,
+        'sorted_bags': SortedBag.objects.count(),
+        'active_personnel': SortingPerson.objects.count(),
+    }
+
+
+def get_dashboard_counters():
+    """
+    Return the cached dashboard counters. Saves and deletes adjust them in place, and they
+    are recomputed every DASHBOARD_COUNTERS_TTL seconds to pick up writes made without signals.
+    """
+    keys = [counter_key(name) for name in (*DASHBOARD_COUNTERS, COMPUTED_AT)]
+    cached = cache.get_many(keys)
+    if len(cached) == len(keys) and time.time() - cached[counter_key(COMPUTED_AT)] < settings.DASHBOARD_COUNTERS_TTL:
+        return {name: cached[counter_key(name)] for name in DASHBOARD_COUNTERS}
+
+    counters = compute_dashboard_counters()
+    cache.set_many(
+        {**{counter_key(name): value for name, value in counters.items()}, counter_key(COMPUTED_AT): time.time()},
+        settings.DASHBOARD_COUNTERS_TTL,
+    )
+    return counters
+
+
+def adjust_dashboard_counters(**deltas):
+    """
+    Add ``deltas`` (counter name: change) to the cached counters; uncached ones wait for
+    the recompute. incr on the file-based cache is a read-modify-write, so two processes
+    adjusting the same counter at once can lose one change. The counters may then be off
+    by the changes lost since the last recompute, for at most DASHBOARD_COUNTERS_TTL
+    seconds, after which they are exact again.
+    """
+    for name, delta in deltas.items():
+        if not delta:
+            continue
+        try:
+            cache.incr(counter_key(name), delta)
+        except ValueError:
+            pass
+
+
+def bag_counter_deltas(processed, sign=1):
+    """Counter changes for adding (or removing, with sign=-1) a bag"""
+    return {'total_bags': sign, 'processed_bags' if processed else 'pending_bags': sign}
+
+
+def invalidate_dashboard_counters():
+    cache.delete(counter_key(COMPUTED_AT))
@@ -0,0 +1,114 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, close_old_connections
+from django.db.models import Max
+from django.utils import timezone
+
+from .counters import get_dashboard_counters
+from .models import Bag
+
+
+class DashboardBroadcast:
+    """
+    Fans dashboard events out to every event stream open in this process. A single
+    watcher task per process polls for new bags and counter changes while anyone is
+    subscribed, so the database cost does not grow with the number of open dashboards.
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+        self.watcher = None
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=settings.DASHBOARD_EVENTS_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        if self.watcher is None or self.watcher.done():
+            self.watcher = asyncio.create_task(self.watch())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+        if not self.subscribers and self.watcher is not None:
+            self.watcher.cancel()
+            self.watcher = None
+
+    def publish(self, event, data):
+        for queue in self.subscribers:
+            if queue.full():
+                # A client that stopped reading loses its oldest events, not the others
+                queue.get_nowait()
+            queue.put_nowait((event, data))
+
+    async def watch(self):
+        last_bag_id, counters = await sync_to_async(read_state)()
+        while True:
+            await asyncio.sleep(settings.DASHBOARD_EVENTS_POLL_INTERVAL)
+            try:
+                bags, new_counters = await sync_to_async(read_changes)(last_bag_id)
+            except DatabaseError:
+                # Try again on the next tick rather than ending every stream
+                continue
+            for bag in bags:
+                self.publish('bag_created', bag)
+                last_bag_id = bag['id']
+            delta = {key: value - counters.get(key, 0) for key, value in new_counters.items()
+                     if value != counters.get(key, 0)}
+            if delta:
+                self.publish('counters', {'counters': new_counters, 'delta': delta})
+                counters = new_counters
+
+
+def read_state():
+    close_old_connections()
+    last_bag_id = Bag.objects.aggregate(last=Max('id'))['last'] or 0
+    return last_bag_id, get_dashboard_counters()
+
+
+def read_changes(last_bag_id):
+    close_old_connections()
+    bags = Bag.objects.filter(pk__gt=last_bag_id).order_by('pk').values(
+        'id', 'bag_id', 'weight_kg', 'extra', 'received_at',
+        'socket__socket_name', 'bag_type__name', 'bag_subtype__name',
+    )[:settings.DASHBOARD_EVENTS_MAX_BAGS]
+    return [
+        {
+            'id': bag['id'],
+            'bag_id': bag['bag_id'],
+            'socket': bag['socket__socket_name'],
+            'bag_type': bag['bag_type__name'],
+            'bag_subtype': bag['bag_subtype__name'],
+            'parameter': 'Extra' if bag['extra'] else 'Standard',
+            'weight_kg': bag['weight_kg'],
+            'received_at': timezone.localtime(bag['received_at']).strftime('%H:%M:%S'),
+        }
+        for bag in bags
+    ], get_dashboard_counters()
+
+
+def format_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'
+
+
+broadcast = DashboardBroadcast()
+
+
+async def dashboard_event_stream():
+    """Server-Sent Events for one dashboard: the current counters, then changes as they happen"""
+    queue = broadcast.subscribe()
+    try:
+        counters = await sync_to_async(get_dashboard_counters)()
+        yield 'retry: 5000\n' + format_event('counters', {'counters': counters, 'delta': {}})
+        while True:
+            try:
+                event, data = await asyncio.wait_for(queue.get(), settings.DASHBOARD_EVENTS_KEEPALIVE)
+            except asyncio.TimeoutError:
+                # Comment line, keeps proxies from closing an idle stream
+                yield ': keepalive\n\n'
+                continue
+            yield format_event(event, data)
+    finally:
+        broadcast.unsubscribe(queue)
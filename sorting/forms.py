@@ -1,38 +1,65 @@
 from django import forms
-from .models import Socket, BagType, BagSubtype
+from .catalog import get_catalog
+from .models import BagType, Bag
+
+
+class CatalogChoiceField(forms.ChoiceField):
+    """
+    Choice field over records of the in-process catalog, the query-free counterpart of
+    ModelChoiceField. Cleans to the selected record; templates iterate ``field.records``.
+    """
+
+    def __init__(self, records=(), empty_label=None, **kwargs):
+        self.records = tuple(records)
+        self.records_by_pk = {str(record.pk): record for record in self.records}
+        choices = [('', empty_label or '---------')]
+        choices += [(record.pk, str(record)) for record in self.records]
+        super().__init__(choices=choices, **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        record = self.records_by_pk.get(str(value))
+        if record is None:
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value}
+            )
+        return record
+
+    def validate(self, value):
+        forms.Field.validate(self, value)
 
 
 class SocketSelectionForm(forms.Form):
-    socket = forms.ModelChoiceField(
-        queryset=Socket.objects.filter(is_active=True).order_by('order'),
-        widget=forms.Select(attrs={'class': 'form-control'}),
-        empty_label="Wybierz gniazdo..."
-    )
     bag_source = forms.ChoiceField(
         choices=[('IN', 'IN'), ('OUT', 'OUT')],
         required=False,
         widget=forms.Select(attrs={'class': 'form-control'})
     )
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['socket'] = CatalogChoiceField(
+            records=get_catalog().sockets,
+            widget=forms.Select(attrs={'class': 'form-control'}),
+            empty_label="Wybierz gniazdo..."
+        )
+        # Keep the socket field first, as it was when declared on the class
+        self.order_fields(['socket'])
+
 
 class BagTypeSelectionForm(forms.Form):
     def __init__(self, socket_id=None, bag_source=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if socket_id:
-            queryset = BagType.objects.filter(socket_id=socket_id, is_active=True)
-            
             # Filter by bag_source if provided (for SEP socket)
-            if bag_source:
-                queryset = queryset.filter(bag_source=bag_source)
-            
-            self.fields['bag_type'] = forms.ModelChoiceField(
-                queryset=queryset.order_by('order'),
+            self.fields['bag_type'] = CatalogChoiceField(
+                records=get_catalog().bag_types_for(socket_id, bag_source),
                 widget=forms.Select(attrs={'class': 'form-control'}),
                 empty_label="Wybierz typ worka..."
             )
         else:
-            self.fields['bag_type'] = forms.ModelChoiceField(
-                queryset=BagType.objects.none(),
+            self.fields['bag_type'] = CatalogChoiceField(
                 widget=forms.Select(attrs={'class': 'form-control'}),
                 empty_label="Najpierw wybierz gniazdo..."
             )
@@ -48,16 +75,13 @@ class BagSubtypeSelectionForm(forms.Form):
     def __init__(self, bag_type_id=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if bag_type_id:
-            queryset = BagSubtype.objects.filter(bag_type_id=bag_type_id, is_active=True)
-            
-            self.fields['bag_subtype'] = forms.ModelChoiceField(
-                queryset=queryset.order_by('order'),
+            self.fields['bag_subtype'] = CatalogChoiceField(
+                records=get_catalog().subtypes_for(bag_type_id),
                 widget=forms.Select(attrs={'class': 'form-control'}),
                 empty_label="Wybierz podtyp..."
             )
         else:
-            self.fields['bag_subtype'] = forms.ModelChoiceField(
-                queryset=BagSubtype.objects.none(),
+            self.fields['bag_subtype'] = CatalogChoiceField(
                 widget=forms.Select(attrs={'class': 'form-control'}),
                 empty_label="Najpierw wybierz typ worka..."
             )
@@ -87,5 +111,98 @@ class WeightForm(forms.Form):
         }),
         label="Notatki"
     )
+    # Key of the scale reading the weight came from (sorting.scales), consumed on save
+    scale_reading = forms.CharField(required=False, widget=forms.HiddenInput)
+
+
+
+
+class BagRecordForm(forms.Form):
+    """
+    A single bag record of the bulk entry API, validated against the in-process catalog.
+    Socket, bag type and subtype are given either by code (``socket``, ``bag_type``, and
+    ``bag_subtype`` by code or name) or by primary key (``socket_id``, ``bag_type_id``,
+    ``bag_subtype_id``), never both, so a numeric code cannot be mistaken for an id.
+    """
+    socket = forms.CharField(max_length=50, required=False)
+    socket_id = forms.IntegerField(required=False)
+    bag_type = forms.CharField(max_length=20, required=False)
+    bag_type_id = forms.IntegerField(required=False)
+    bag_subtype = forms.CharField(max_length=100, required=False)
+    bag_subtype_id = forms.IntegerField(required=False)
+    parameter = forms.ChoiceField(choices=BagType.PARAMETER_CHOICES, required=False)
+    weight_kg = forms.DecimalField(max_digits=5, decimal_places=2, min_value=0)
+    notes = forms.CharField(required=False)
+    client_key = forms.CharField(max_length=64, required=False)
+
+    def __init__(self, *args, catalog, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.catalog = catalog
+
+    def find(self, name, by_code, by_id, unknown):
+        """
+        The record named by the ``name`` code field or the ``name``_id field, or None if
+        neither is given. Raises ValidationError if both are given or nothing matches.
+        """
+        code, pk = self.cleaned_data[name], self.cleaned_data[f'{name}_id']
+        if code and pk is not None:
+            raise forms.ValidationError({name: f'Give either {name} or {name}_id, not both.'})
+        if not code and pk is None:
+            return None
+        record = by_code(code) if code else by_id(pk)
+        if record is None:
+            raise forms.ValidationError({name: unknown})
+        return record
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.errors:
+            return cleaned_data
+
+        socket = self.find(
+            'socket', self.catalog.find_socket, self.catalog.sockets_by_id.get, 'Unknown or inactive socket.'
+        )
+        if socket is None:
+            raise forms.ValidationError({'socket': 'This field is required.'})
+
+        bag_type = self.find(
+            'bag_type', self.catalog.find_bag_type, self.catalog.bag_types_by_id.get, 'Unknown bag type for this socket.'
+        )
+        if bag_type is None:
+            raise forms.ValidationError({'bag_type': 'This field is required.'})
+        if bag_type.socket_id != socket.id:
+            raise forms.ValidationError({'bag_type': 'Unknown bag type for this socket.'})
+
+        bag_subtype = self.find(
+            'bag_subtype',
+            lambda code: self.catalog.find_subtype(bag_type, code),
+            lambda pk: next((subtype for subtype in self.catalog.subtypes_for(bag_type.id) if subtype.id == pk), None),
+            'Unknown subtype for this bag type.',
+        )
+        if bag_subtype is None and self.catalog.has_subtypes(bag_type):
+            raise forms.ValidationError({'bag_subtype': 'This bag type requires a subtype.'})
+
+        parameter = cleaned_data['parameter']
+        if parameter and parameter not in (bag_type.parameter or []):
+            raise forms.ValidationError({'parameter': 'Parameter not available for this bag type.'})
 
+        cleaned_data.update({
+            'socket': socket,
+            'bag_type': bag_type,
+            'bag_subtype': bag_subtype,
+        })
+        return cleaned_data
 
+    def build_bag(self):
+        """Return an unsaved Bag for the validated record, without a bag_id yet"""
+        data = self.cleaned_data
+        return Bag(
+            socket=data['socket'],
+            bag_type=data['bag_type'],
+            bag_subtype=data['bag_subtype'],
+            weight_kg=data['weight_kg'],
+            notes=data['notes'],
+            item_count=1,
+            extra=data['parameter'] == 'Extra',
+            client_key=data['client_key'] or None,
+        )
@@ -0,0 +1,120 @@
+"""
+Idempotent bag creation. Every attempt at creating one bag carries the same idempotency
+key (the Idempotency-Key header, an idempotency_key field or one drawn by the wizard);
+the first attempt creates the bag and any retry gets that bag back.
+
+Recent keys are answered from a short-lived key store in its own cache (IDEMPOTENCY_CACHE),
+so a retry costs one primary key lookup. The key is also saved in the bag's unique
+client_key column, which keeps create-or-return atomic when two attempts race or the
+store has already forgotten the key.
+"""
+import hashlib
+import json
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+
+from .bag_ids import get_bag_id_generator
+from .models import Bag
+
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+IDEMPOTENCY_FIELD = 'idempotency_key'
+# Length of Bag.client_key
+MAX_KEY_LENGTH = 64
+
+
+class InvalidIdempotencyKey(ValueError):
+    pass
+
+
+class IdempotencyKeyConflict(ValueError):
+    pass
+
+
+KEY_CONFLICT_MESSAGE = 'This idempotency key was already used for a different bag.'
+
+
+def new_idempotency_key():
+    return uuid.uuid4().hex
+
+
+def get_idempotency_key(request):
+    """The key the client sent with ``request``, None without one"""
+    key = request.META.get(IDEMPOTENCY_HEADER) or request.POST.get(IDEMPOTENCY_FIELD)
+    if not key:
+        return None
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH or not key.isprintable():
+        raise InvalidIdempotencyKey(f'Idempotency keys are 1 to {MAX_KEY_LENGTH} printable characters.')
+    return key
+
+
+def bag_fingerprint(bag):
+    """Hash of what was asked for, telling a retry apart from a different bag sent under a reused key"""
+    weight = None if bag.weight_kg is None else str(Decimal(str(bag.weight_kg)).quantize(Decimal('0.01')))
+    values = [bag.socket_id, bag.bag_type_id, bag.bag_subtype_id, weight, bag.notes or '', bool(bag.extra)]
+    return hashlib.sha256(json.dumps(values).encode()).hexdigest()
+
+
+class IdempotencyKeyStore:
+    """Recent idempotency keys with the primary key and fingerprint of the bags they created"""
+
+    def __init__(self):
+        self.cache = caches[settings.IDEMPOTENCY_CACHE]
+
+    def cache_key(self, key):
+        return f'sorting:idempotency:{key}'
+
+    def get(self, key):
+        return self.cache.get(self.cache_key(key))
+
+    def set(self, key, bag_pk, fingerprint):
+        self.cache.set(self.cache_key(key), {'pk': bag_pk, 'fingerprint': fingerprint}, settings.IDEMPOTENCY_KEY_TTL)
+
+
+def create_bag_once(key, bag):
+    """
+    Return ``(bag, created)``: the bag created earlier with idempotency ``key``, or the
+    unsaved ``bag`` saved under that key. ``bag`` comes without a bag_id; one is generated
+    only when the bag is inserted, so a retry uses up no sequence number. Without a key
+    the bag is simply saved. Raises IdempotencyKeyConflict if the key store remembers
+    the key being used for a different bag.
+    """
+    if key is None:
+        return save_new_bag(bag), True
+
+    store = IdempotencyKeyStore()
+    fingerprint = bag_fingerprint(bag)
+    stored = store.get(key)
+    if stored is not None:
+        existing = Bag.objects.filter(pk=stored['pk']).first()
+        if existing is not None:
+            if stored['fingerprint'] != fingerprint:
+                raise IdempotencyKeyConflict(KEY_CONFLICT_MESSAGE)
+            return existing, False
+
+    bag.client_key = key
+    try:
+        with transaction.atomic():
+            save_new_bag(bag)
+    except IntegrityError:
+        # A concurrent attempt, or one the store has forgotten, saved the bag first
+        existing = Bag.objects.filter(client_key=key).first()
+        if existing is None:
+            raise
+        # The bag may have been edited since, so it cannot be told apart from a different
+        # bag under a reused key; only the key store catches reuse
+        store.set(key, existing.pk, fingerprint)
+        return existing, False
+    store.set(key, bag.pk, fingerprint)
+    return bag, True
+
+
+def save_new_bag(bag):
+    bag.bag_id = get_bag_id_generator().generate(bag.socket)
+    bag.save()
+    return bag
@@ -0,0 +1,72 @@
+import io
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.module_loading import import_string
+from sorting.benchmarks import benchmark_database
+from sorting.models import BagType, Bag
+
+
+DEFAULT_GENERATORS = [
+    'sorting.bag_ids.RandomBagIdGenerator',
+    'sorting.bag_ids.TimeOrderedBagIdGenerator',
+    'sorting.bag_ids.SocketSequenceBagIdGenerator',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure bag insert throughput for each bag ID generator in a throwaway test database '
+        '(a file on SQLite, so commits cost what they do in production). Single inserts commit '
+        'one bag at a time, as the entry wizard does; bulk inserts run in batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=5000, help='Bags inserted per generator')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per bulk_create batch')
+        parser.add_argument('--generator', action='append', dest='generators',
+                            help='Dotted path of a generator to benchmark (repeatable)')
+
+    def handle(self, *args, **options):
+        with benchmark_database(on_disk=True):
+            call_command('populate_data', stdout=io.StringIO())
+            self.run_benchmarks(options)
+
+    def run_benchmarks(self, options):
+        bag_type = BagType.objects.select_related('socket').filter(is_active=True).first()
+        for path in options['generators'] or DEFAULT_GENERATORS:
+            generator = import_string(path)()
+            single, sample = self.run(generator, bag_type, options['count'], 1)
+            bulk, _ = self.run(generator, bag_type, options['count'], options['batch_size'])
+            self.stdout.write(
+                f"{path.rsplit('.', 1)[-1]:<32} "
+                f"single: {single:>9.0f} bags/s   bulk({options['batch_size']}): {bulk:>9.0f} bags/s   "
+                f"sample: {sample}"
+            )
+
+    def run(self, generator, bag_type, count, batch_size):
+        """Insert ``count`` bags in batches of ``batch_size``, return bags per second and the last ID"""
+        if batch_size == 1:
+            return self.run_single(generator, bag_type, count)
+        with transaction.atomic():
+            started = time.perf_counter()
+            for start in range(0, count, batch_size):
+                size = min(batch_size, count - start)
+                bag_ids = generator.generate_batch(size, bag_type.socket)
+                Bag.objects.bulk_create([
+                    Bag(bag_id=bag_id, socket=bag_type.socket, bag_type=bag_type, item_count=1)
+                    for bag_id in bag_ids
+                ])
+            elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        return count / elapsed, bag_ids[-1]
+
+    def run_single(self, generator, bag_type, count):
+        """One autocommitted save() per bag, signals included"""
+        started = time.perf_counter()
+        for _ in range(count):
+            bag = Bag(bag_id=generator.generate(bag_type.socket), socket=bag_type.socket, bag_type=bag_type, item_count=1)
+            bag.save()
+        return count / (time.perf_counter() - started), bag.bag_id
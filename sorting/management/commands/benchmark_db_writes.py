@@ -0,0 +1,100 @@
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, OperationalError
+from sorting.bag_ids import get_bag_id_generator
+from sorting.models import BagType, Bag
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure bag inserts under write contention: several threads, each with its own '
+        'database connection, save bags one by one like separate stations. '
+        'Run once per backend (e.g. DB_ENGINE=postgresql) to compare them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help='Concurrent writer threads')
+        parser.add_argument('--bags', type=int, default=200, help='Bags saved by each writer')
+        parser.add_argument('--database', default='default', help='Database alias to benchmark')
+        parser.add_argument('--keep', action='store_true', help='Keep the inserted bags')
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        bag_type = BagType.objects.using(alias).select_related('socket').filter(is_active=True).first()
+        if bag_type is None:
+            raise CommandError('No active bag types, run populate_data first.')
+
+        self.describe(alias)
+        generator = get_bag_id_generator()
+        latencies = []
+        errors = []
+        created_ids = []
+        lock = threading.Lock()
+        start_barrier = threading.Barrier(options['writers'])
+
+        def writer():
+            own_latencies, own_errors, own_ids = [], [], []
+            start_barrier.wait()
+            try:
+                for _ in range(options['bags']):
+                    bag = Bag(
+                        bag_id=generator.generate(bag_type.socket),
+                        socket=bag_type.socket,
+                        bag_type=bag_type,
+                        item_count=1,
+                        notes='benchmark_db_writes',
+                    )
+                    started = time.perf_counter()
+                    try:
+                        bag.save(using=alias)
+                    except OperationalError as error:
+                        own_errors.append(str(error))
+                    else:
+                        own_ids.append(bag.pk)
+                    own_latencies.append(time.perf_counter() - started)
+            finally:
+                connections[alias].close()
+                with lock:
+                    latencies.extend(own_latencies)
+                    errors.extend(own_errors)
+                    created_ids.extend(own_ids)
+
+        threads = [threading.Thread(target=writer) for _ in range(options['writers'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        if not options['keep']:
+            Bag.objects.using(alias).filter(pk__in=created_ids).delete()
+
+        latencies.sort()
+        self.stdout.write(
+            f"writers: {options['writers']}   saved: {len(created_ids)}   failed: {len(errors)}   "
+            f"throughput: {len(created_ids) / elapsed:.0f} bags/s"
+        )
+        if latencies:
+            self.stdout.write(
+                f"latency ms   p50: {statistics.median(latencies) * 1000:.1f}   "
+                f"p95: {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}   "
+                f"max: {latencies[-1] * 1000:.1f}"
+            )
+        for message in sorted(set(errors)):
+            self.stdout.write(self.style.ERROR(f'{errors.count(message)} x {message}'))
+
+    def describe(self, alias):
+        connection = connections[alias]
+        description = connection.vendor
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                pragmas = {
+                    name: cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                    for name in ('journal_mode', 'synchronous', 'busy_timeout')
+                }
+            description += ' ' + ' '.join(f'{name}={value}' for name, value in pragmas.items())
+        self.stdout.write(description)
@@ -0,0 +1,53 @@
+import io
+import time
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from sorting.benchmarks import benchmark_database, benchmark_requests, measure
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database with a large dataset, then measure queries, p50/p95 '
+        'latency and peak memory of every URL and of a full wizard bag entry'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bags', type=int, default=100000, help='Sample bags to seed')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per request')
+        parser.add_argument('--only', action='append', help='Measure only these requests (repeatable)')
+        parser.add_argument('--exclude', action='append', default=[], help='Skip these requests (repeatable)')
+        parser.add_argument('--check', action='store_true', help='Fail if a request exceeds its query budget')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            over_budget = self.run_benchmarks(options)
+
+        if options['check'] and over_budget:
+            raise CommandError(f"Over the query budget: {', '.join(over_budget)}")
+
+    def run_benchmarks(self, options):
+        started = time.perf_counter()
+        call_command('populate_data', bags=options['bags'], stdout=io.StringIO())
+        self.stdout.write(f"Seeded {options['bags']} bags in {time.perf_counter() - started:.1f}s")
+
+        client = Client()
+        client.force_login(User.objects.create_superuser('benchmark', 'benchmark@example.com', 'benchmark'))
+
+        over_budget = []
+        self.stdout.write(f"{'request':<24}{'queries':>9}{'budget':>8}{'p50 ms':>10}{'p95 ms':>10}{'peak KB':>10}")
+        for request in benchmark_requests():
+            if (options['only'] and request.name not in options['only']) or request.name in options['exclude']:
+                continue
+            result = measure(request, client, options['repeat'])
+            line = (
+                f"{request.name:<24}{result['queries']:>9}{request.budget:>8}"
+                f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['peak_kb']:>10.0f}"
+            )
+            if result['queries'] > request.budget:
+                over_budget.append(request.name)
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+        return over_budget
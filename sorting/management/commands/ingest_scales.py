@@ -0,0 +1,64 @@
+import asyncio
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from sorting.catalog import get_catalog
+from sorting.scales import BulkBagSink, InvalidScaleURL, WizardSink, check_scale_url, ingest
+
+
+class Command(BaseCommand):
+    help = (
+        'Read weighings from the sockets\' scales and hand them to the entry wizard of each '
+        'socket, or save them directly as bags with --bag-type'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'scales', nargs='+', metavar='SOCKET=URL',
+            help='Socket code and its scale: tcp://host:port, serial:///dev/ttyUSB0 or sim://[?seed=1&interval=0.2]',
+        )
+        parser.add_argument('--bag-type', help='Save every weighing as a bag of this bag type code')
+        parser.add_argument('--settle', type=float, default=settings.SCALE_SETTLE_SECONDS,
+                            help='Seconds a load must hold still to count as a weighing')
+        parser.add_argument('--tolerance', default=settings.SCALE_TOLERANCE_KG,
+                            help='Largest change (kg) of a load still considered still')
+        parser.add_argument('--min-weight', default=settings.SCALE_MIN_WEIGHT_KG,
+                            help='Lightest load (kg) taken as a bag; below it the scale counts as empty')
+        parser.add_argument('--limit', type=int, help='Stop after this many weighings per scale')
+
+    def handle(self, *args, **options):
+        try:
+            tolerance_kg = Decimal(options['tolerance'])
+            min_kg = Decimal(options['min_weight'])
+        except InvalidOperation:
+            raise CommandError('--tolerance and --min-weight must be numbers')
+        if options['settle'] < 0 or tolerance_kg < 0 or min_kg <= 0:
+            raise CommandError('--settle and --tolerance must not be negative, --min-weight must be positive')
+
+        catalog = get_catalog()
+        scales = []
+        for value in options['scales']:
+            code, _, url = value.partition('=')
+            socket = catalog.find_socket(code)
+            if socket is None:
+                raise CommandError(f'Unknown socket {code!r}')
+            try:
+                check_scale_url(url)
+            except InvalidScaleURL as error:
+                raise CommandError(str(error))
+            scales.append((socket, url))
+
+        if options['bag_type']:
+            if catalog.find_bag_type(options['bag_type']) is None:
+                raise CommandError(f"Unknown bag type {options['bag_type']!r}")
+            sink = BulkBagSink(options['bag_type'])
+        else:
+            sink = WizardSink()
+
+        try:
+            asyncio.run(ingest(
+                scales, sink, self.stdout.write, options['settle'], tolerance_kg, min_kg, options['limit']
+            ))
+        except KeyboardInterrupt:
+            pass
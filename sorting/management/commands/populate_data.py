@@ -1,9 +1,117 @@
-from django.core.management.base import BaseCommand
-from sorting.models import Socket, BagType
+import random
+import time
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from sorting.bag_ids import get_bag_id_generator
+from sorting.counters import invalidate_dashboard_counters
+from sorting.models import Socket, BagType, BagSubtype, Bag, SortedBag, SortingPerson
+from sorting.rollups import rebuild_daily_production
+from sorting.search import index_documents
+
+
+# Subtypes created with the sample bags, by bag type code
+SAMPLE_SUBTYPES = {
+    'MLT': ['damskie', 'męskie', 'dziecięce'],
+    'MZM': ['damskie', 'męskie', 'dziecięce'],
+    'AGR': ['premium', 'standard'],
+}
+SORTED_DESTINATIONS = ['retail', 'outlet', 'donation', 'recycling', 'disposal']
+SORTED_DESTINATION_WEIGHTS = [45, 20, 15, 15, 5]
+QUALITY_GRADES = ['A', 'B', 'C']
+QUALITY_GRADE_WEIGHTS = [50, 35, 15]
+
+
+# Columns of the sample rows, in the order sample_bag() and sample_sorted_bag() build them
+BAG_COLUMNS = (
+    'id', 'bag_id', 'socket_id', 'sorting_person_id', 'bag_type_id', 'bag_subtype_id', 'quality_grade', 'weight_kg',
+    'item_count', 'is_processed', 'extra', 'notes', 'received_at', 'processed_at', 'updated_at', 'client_key',
+)
+SORTED_BAG_COLUMNS = (
+    'id', 'original_bag_id', 'destination', 'status', 'final_quality_check', 'packaging_notes', 'shipped_at',
+    'delivered_at', 'tracking_number', 'created_at', 'updated_at',
+)
+
+
+def insert_rows(model, columns, rows):
+    """
+    Insert ``rows`` (tuples of database values for ``columns``) with one executemany,
+    skipping the model instances and the ORM compiler that bulk_create would go through.
+    """
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {quote(model._meta.db_table)} ({', '.join(quote(column) for column in columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(columns))})",
+            rows,
+        )
+
+
+def next_pk(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def shift_windows(start, end):
+    """(start, end) of the SORTING_SHIFTS shifts between ``start`` and ``end``, Sundays off"""
+    shifts = [(dt_time.fromisoformat(shift_start), dt_time.fromisoformat(shift_end))
+              for shift_start, shift_end in settings.SORTING_SHIFTS]
+    windows = []
+    day = timezone.localdate(start) - timedelta(days=1)
+    while day <= timezone.localdate(end):
+        if day.weekday() != 6:
+            for shift_start, shift_end in shifts:
+                window_start = timezone.make_aware(datetime.combine(day, shift_start))
+                window_end = timezone.make_aware(datetime.combine(
+                    day if shift_end > shift_start else day + timedelta(days=1), shift_end
+                ))
+                window_start, window_end = max(window_start, start), min(window_end, end)
+                if window_start < window_end:
+                    windows.append((window_start, window_end))
+        day += timedelta(days=1)
+    return sorted(windows) or [(start, end)]
+
+
+def receive_times(count, windows, rng):
+    """
+    ``count`` increasing (time, window index) pairs spread evenly over the windows with
+    some jitter, so the bags are inserted in received_at order like the real ones.
+    """
+    lengths = [(window_end - window_start).total_seconds() for window_start, window_end in windows]
+    step = sum(lengths) / count
+    index, passed = 0, 0.0
+    for position in range(count):
+        offset = (position + rng.random()) * step
+        while offset >= passed + lengths[index] and index + 1 < len(windows):
+            passed += lengths[index]
+            index += 1
+        yield windows[index][0] + timedelta(seconds=min(offset - passed, lengths[index])), index
 
 
 class Command(BaseCommand):
-    help = 'Populate Socket and BagType objects from predefined lists'
+    help = (
+        'Populate Socket and BagType objects from predefined lists, optionally with a '
+        'synthetic history of bags (see --bags). Sample bags are written at roughly 7,500 '
+        'bags/s on SQLite, so 10 million take about 20-25 minutes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bags', type=int, default=0, help='Also create this many sample bags')
+        parser.add_argument('--days', type=int, default=0,
+                            help='Spread the sample bags over the shifts of this many past days (default: all received now)')
+        parser.add_argument('--persons', type=int, default=12, help='Sorting persons the sample bags are shared between')
+        parser.add_argument('--sorted-ratio', type=float, default=0.7,
+                            help='Share of the processed sample bags that get a sorted bag')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Sample bags per transaction')
+        parser.add_argument('--seed', type=int,
+                            help='Random seed; the same seed gives the same data apart from the bag IDs')
 
     def handle(self, *args, **options):
         # Create Sockets
@@ -124,4 +232,156 @@ class Command(BaseCommand):
             if created:
                 self.stdout.write(f'Created BagType: {name} for AF')
 
-        self.stdout.write(self.style.SUCCESS('Successfully populated all data!'))
\ No newline at end of file
+        if options['bags']:
+            if not 0 <= options['sorted_ratio'] <= 1:
+                raise CommandError('--sorted-ratio must be between 0 and 1')
+            if options['batch_size'] < 1 or options['days'] < 0:
+                raise CommandError('--batch-size must be positive and --days not negative')
+            self.create_sample_bags(options)
+
+        self.stdout.write(self.style.SUCCESS('Successfully populated all data!'))
+
+    def create_sample_persons(self, count):
+        persons = []
+        for number in range(1, count + 1):
+            person, _ = SortingPerson.objects.get_or_create(
+                person_id=f'SRT{number:03d}',
+                defaults={'name': f'Sortownik {number:02d}'},
+            )
+            persons.append(person)
+        return persons
+
+    def create_sample_subtypes(self):
+        for code, names in SAMPLE_SUBTYPES.items():
+            bag_type = BagType.objects.filter(code=code).first()
+            if bag_type is None:
+                continue
+            for order, name in enumerate(names, 1):
+                BagSubtype.objects.get_or_create(bag_type=bag_type, name=name, defaults={'order': order})
+
+    def create_sample_bags(self, options):
+        """
+        Synthetic history: bags received over the shifts of the last ``--days`` days, each
+        shift worked by its own crew, processed a while after receipt and mostly followed
+        by a sorted bag whose status depends on its age. Batches are inserted as plain rows
+        with primary keys assigned here, each in its own transaction, and the
+        DailyProduction rollup is rebuilt once at the end.
+        """
+        count, batch_size = options['bags'], options['batch_size']
+        seed = options['seed'] if options['seed'] is not None else random.randrange(2 ** 32)
+        rng = random.Random(seed)
+
+        self.create_sample_subtypes()
+        persons = self.create_sample_persons(options['persons'])
+        bag_types = list(BagType.objects.filter(is_active=True).select_related('socket'))
+        subtypes = {}
+        for subtype in BagSubtype.objects.filter(is_active=True):
+            subtypes.setdefault(subtype.bag_type_id, []).append(subtype)
+        # Some bag types are much more common than others
+        type_weights = [rng.randint(1, 10) for _ in bag_types]
+
+        now = timezone.now()
+        windows = shift_windows(now - timedelta(days=options['days']), now)
+        crew_size = max(1, len(persons) // len(settings.SORTING_SHIFTS))
+        crews = [rng.sample(persons, min(crew_size, len(persons))) for _ in windows] if persons else None
+
+        generator = get_bag_id_generator()
+        bag_pk, sorted_bag_pk = next_pk(Bag), next_pk(SortedBag)
+        times = receive_times(count, windows, rng)
+        started = reported = time.perf_counter()
+        first_received_at = last_received_at = None
+        sorted_count = 0
+
+        for batch_start in range(0, count, batch_size):
+            batch_count = min(batch_size, count - batch_start)
+            bag_rows, sorted_rows, documents, rows_by_socket = [], [], [], {}
+            for bag_type in rng.choices(bag_types, weights=type_weights, k=batch_count):
+                received_at, window = next(times)
+                first_received_at = first_received_at or received_at
+                row, subtype, processed_at = self.sample_bag(
+                    rng, now, bag_pk, bag_type, subtypes, crews[window] if crews else None, received_at
+                )
+                bag_rows.append(row)
+                rows_by_socket.setdefault(bag_type.socket, []).append(row)
+                documents.append([bag_pk, None, '', bag_type.name, subtype.name if subtype else ''])
+                if processed_at and rng.random() < options['sorted_ratio']:
+                    sorted_rows.append(self.sample_sorted_bag(rng, now, sorted_bag_pk, bag_pk, processed_at))
+                    sorted_bag_pk += 1
+                bag_pk += 1
+            last_received_at = received_at
+
+            for socket, socket_rows in rows_by_socket.items():
+                for row, bag_id in zip(socket_rows, generator.generate_batch(len(socket_rows), socket)):
+                    row[1] = bag_id
+            for row, document in zip(bag_rows, documents):
+                document[1] = row[1]
+
+            with transaction.atomic():
+                insert_rows(Bag, BAG_COLUMNS, bag_rows)
+                insert_rows(SortedBag, SORTED_BAG_COLUMNS, sorted_rows)
+                index_documents(documents, created=True)
+
+            sorted_count += len(sorted_rows)
+            if time.perf_counter() - reported >= 5:
+                reported = time.perf_counter()
+                created = batch_start + batch_count
+                self.stdout.write(f'{created}/{count} bags, {created / (reported - started):.0f} bags/s')
+
+        # The primary keys were assigned here, so move the sequences past them (no-op on SQLite)
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Bag, SortedBag]):
+                cursor.execute(sql)
+
+        rows = rebuild_daily_production(timezone.localdate(first_received_at), timezone.localdate(last_received_at))
+        invalidate_dashboard_counters()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Created {count} sample bags and {sorted_count} sorted bags in {elapsed:.1f}s '
+            f'({count / elapsed:.0f} bags/s, seed {seed}), {rows} rollup rows'
+        )
+
+    def sample_bag(self, rng, now, pk, bag_type, subtypes, crew, received_at):
+        """A BAG_COLUMNS row without its bag_id, its subtype, and when it was processed (None if pending)"""
+        type_subtypes = subtypes.get(bag_type.id)
+        # Processed a while after it came in, apart from a small backlog that is never picked up
+        processed_at = received_at + timedelta(minutes=rng.uniform(5, 180))
+        is_processed = processed_at <= now and rng.random() >= 0.02
+        subtype = rng.choice(type_subtypes) if type_subtypes else None
+        person = rng.choice(crew) if crew else None
+        extra = 'Extra' in (bag_type.parameter or ()) and rng.random() < 0.3
+        weight_kg = Decimal(rng.randint(500, 3000)) / 100
+        item_count = rng.randint(20, 120)
+        quality_grade = rng.choices(QUALITY_GRADES, weights=QUALITY_GRADE_WEIGHTS)[0] if is_processed else ''
+        if not is_processed:
+            processed_at = None
+        adapt = connection.ops.adapt_datetimefield_value
+        received_value = adapt(received_at)
+        processed_value = adapt(processed_at) if processed_at else None
+        row = [
+            pk, None, bag_type.socket_id, person.pk if person else None, bag_type.id, subtype.id if subtype else None,
+            quality_grade, weight_kg, item_count, is_processed, extra, '',
+            received_value, processed_value, processed_value or received_value, None,
+        ]
+        return row, subtype, processed_at
+
+    def sample_sorted_bag(self, rng, now, pk, bag_pk, processed_at):
+        """A SORTED_BAG_COLUMNS row for the bag ``bag_pk``"""
+        adapt = connection.ops.adapt_datetimefield_value
+        created_at = min(processed_at + timedelta(minutes=rng.uniform(0, 30)), now)
+        destination = rng.choices(SORTED_DESTINATIONS, weights=SORTED_DESTINATION_WEIGHTS)[0]
+        status, final_quality_check, tracking_number = 'pending', False, ''
+        created_value = updated_value = adapt(created_at)
+        shipped_value = delivered_value = None
+        age = now - created_at
+        if age >= timedelta(days=1):
+            status, final_quality_check = 'shipped', True
+            tracking_number = f'PL{rng.randrange(10 ** 10):010d}'
+            shipped_at = created_at + timedelta(hours=rng.uniform(6, 24))
+            shipped_value = updated_value = adapt(shipped_at)
+        if age >= timedelta(days=4):
+            status = 'returned' if rng.random() < 0.03 else 'delivered'
+            delivered_value = updated_value = adapt(shipped_at + timedelta(days=rng.uniform(1, 3)))
+        return (
+            pk, bag_pk, destination, status, final_quality_check, '', shipped_value, delivered_value,
+            tracking_number, created_value, updated_value,
+        )
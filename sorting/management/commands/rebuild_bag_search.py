@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from sorting.search import rebuild_bag_search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the bag search index from scratch, e.g. after migrating an existing database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000, help='Bags indexed per statement')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        indexed = rebuild_bag_search(
+            options['batch_size'], progress=lambda indexed: self.stdout.write(f'{indexed} bags indexed')
+        )
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} bags'))
@@ -0,0 +1,26 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from sorting.rollups import rebuild_daily_production
+
+
+class Command(BaseCommand):
+    help = 'Recompute the DailyProduction rollup from the bags received in a date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='First day to rebuild (YYYY-MM-DD), default: the first bag')
+        parser.add_argument('--to', dest='end', help='Last day to rebuild (YYYY-MM-DD), default: the last bag')
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else None
+            end = date.fromisoformat(options['end']) if options['end'] else None
+        except ValueError as error:
+            raise CommandError(f'Invalid date: {error}')
+        if start and end and start > end:
+            raise CommandError('--from must not be after --to')
+
+        rows = rebuild_daily_production(start, end)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {rows} rollup rows for {start or 'the beginning'} – {end or 'today'}"
+        ))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sorting', '0013_alter_bag_extra_alter_bag_quality_grade_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bag',
+            index=models.Index(fields=['received_at', 'id'], name='bag_received_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bag',
+            index=models.Index(fields=['is_processed', 'received_at', 'id'], name='bag_status_received_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bag',
+            index=models.Index(fields=['bag_type', 'received_at', 'id'], name='bag_type_received_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bag',
+            index=models.Index(fields=['bag_type', 'is_processed', 'received_at', 'id'], name='bag_type_status_received_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sorting', '0014_bag_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bag',
+            index=models.Index(fields=['socket', 'received_at', 'id'], name='bag_socket_received_idx'),
+        ),
+    ]
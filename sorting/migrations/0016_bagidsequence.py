@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sorting', '0015_bag_socket_received_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BagIdSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('last_value', models.PositiveIntegerField(default=0)),
+                ('socket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bag_id_sequences', to='sorting.socket')),
+            ],
+            options={
+                'unique_together': {('socket', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sorting', '0016_bagidsequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bagsubtype',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='bagtype',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='socket',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sorting', '0017_catalog_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyProduction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('extra', models.BooleanField(default=False)),
+                ('bag_count', models.IntegerField(default=0)),
+                ('total_weight_kg', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('bag_subtype', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_production', to='sorting.bagsubtype')),
+                ('bag_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_production', to='sorting.bagtype')),
+                ('socket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_production', to='sorting.socket')),
+                ('sorting_person', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_production', to='sorting.sortingperson')),
+            ],
+            options={
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['day', 'socket'], name='production_day_socket_idx'), models.Index(fields=['sorting_person', 'day'], name='production_person_day_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sorting', '0018_daily_production'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyproduction',
+            name='first_received_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='dailyproduction',
+            name='last_received_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sorting', '0019_daily_production_span'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sortedbag',
+            index=models.Index(fields=['created_at', 'id'], name='sorted_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sortedbag',
+            index=models.Index(fields=['status', 'destination', 'created_at', 'id'], name='sorted_status_dest_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sortedbag',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='sorted_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sortedbag',
+            index=models.Index(fields=['destination', 'created_at', 'id'], name='sorted_dest_created_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sorting', '0020_sorted_bag_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='bag',
+            name='bag_status_received_idx',
+        ),
+        migrations.AddIndex(
+            model_name='bag',
+            index=models.Index(condition=models.Q(('is_processed', False)), fields=['received_at', 'id', 'is_processed'], name='bag_pending_received_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bag',
+            index=models.Index(condition=models.Q(('is_processed', True)), fields=['received_at', 'id'], name='bag_processed_received_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def create_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE TABLE sorting_bag_search (id bigint PRIMARY KEY, document tsvector NOT NULL)')
+        schema_editor.execute('CREATE INDEX sorting_bag_search_document_idx ON sorting_bag_search USING gin (document)')
+    else:
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE sorting_bag_search USING fts5(bag_id, notes, bag_type, bag_subtype, tokenize='trigram')"
+        )
+
+
+def drop_search_table(apps, schema_editor):
+    schema_editor.execute('DROP TABLE IF EXISTS sorting_bag_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sorting', '0021_bag_partial_status_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
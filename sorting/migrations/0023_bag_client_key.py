@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sorting', '0022_bag_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bag',
+            name='client_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
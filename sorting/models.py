@@ -12,6 +12,7 @@ class Socket(models.Model):
     location = models.CharField(max_length=100)
     is_active = models.BooleanField(default=True)
     order = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.socket_id} - {self.socket_name }"
@@ -40,6 +41,7 @@ class BagType(models.Model):
     bag_source = models.CharField(max_length=3, choices=BAG_SOURCE_CHOICES)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     socket = models.ForeignKey(Socket, on_delete=models.CASCADE)
 
     def __str__(self):
@@ -73,6 +75,7 @@ class BagSubtype(models.Model):
     color = ColorField(default='#808080')
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.bag_type.name} - {self.name}"
@@ -104,6 +107,16 @@ class Bag(models.Model):
     received_at = models.DateTimeField(auto_now_add=True)
     processed_at = models.DateTimeField(null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Key an entry station gave the bag when recording it, so that a record sent again
+    # (e.g. by an offline station retrying its sync) is not stored twice
+    client_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so that the daily rollup can move a bag that changed (see rollups.py)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
     def save(self, *args, **kwargs):
         if self.is_processed and not self.processed_at:
@@ -115,6 +128,64 @@ class Bag(models.Model):
 
     class Meta:
         ordering = ['-received_at']
+        indexes = [
+            # Keyset pagination of the bag list and its status/bag_type filters
+            models.Index(fields=['received_at', 'id'], name='bag_received_idx'),
+            # Pending (the work queue) and processed bags each in their own, smaller index.
+            # The trailing is_processed makes the pending one cover the dashboard's pending count.
+            models.Index(fields=['received_at', 'id', 'is_processed'], condition=models.Q(is_processed=False),
+                         name='bag_pending_received_idx'),
+            models.Index(fields=['received_at', 'id'], condition=models.Q(is_processed=True),
+                         name='bag_processed_received_idx'),
+            models.Index(fields=['bag_type', 'received_at', 'id'], name='bag_type_received_idx'),
+            models.Index(fields=['bag_type', 'is_processed', 'received_at', 'id'], name='bag_type_status_received_idx'),
+            # Windowed bag history on the socket detail page
+            models.Index(fields=['socket', 'received_at', 'id'], name='bag_socket_received_idx'),
+        ]
+
+
+class BagIdSequence(models.Model):
+    """Last bag number issued per socket and day, used by SocketSequenceBagIdGenerator"""
+    socket = models.ForeignKey(Socket, on_delete=models.CASCADE, related_name='bag_id_sequences')
+    day = models.DateField()
+    last_value = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.socket.socket_id} {self.day}: {self.last_value}"
+
+    class Meta:
+        unique_together = ['socket', 'day']
+
+
+class DailyProduction(models.Model):
+    """
+    Bags received per day, socket, bag type, subtype, parameter and sorting person.
+    Kept up to date from Bag saves and deletes (see rollups.py); a key can be split
+    over several rows, so always read it through Sum().
+    """
+    day = models.DateField()
+    socket = models.ForeignKey(Socket, on_delete=models.CASCADE, related_name='daily_production')
+    bag_type = models.ForeignKey(BagType, on_delete=models.CASCADE, related_name='daily_production')
+    bag_subtype = models.ForeignKey(BagSubtype, on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name='daily_production')
+    extra = models.BooleanField(default=False)
+    sorting_person = models.ForeignKey(SortingPerson, on_delete=models.SET_NULL, null=True, blank=True,
+                                       related_name='daily_production')
+    bag_count = models.IntegerField(default=0)
+    total_weight_kg = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Time of the first and last bag, for the hours a person actually sorted
+    first_received_at = models.DateTimeField(null=True, blank=True)
+    last_received_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.day} {self.socket_id}/{self.bag_type_id}: {self.bag_count}"
+
+    class Meta:
+        ordering = ['-day']
+        indexes = [
+            models.Index(fields=['day', 'socket'], name='production_day_socket_idx'),
+            models.Index(fields=['sorting_person', 'day'], name='production_person_day_idx'),
+        ]
 
 
 class SortedBag(models.Model):
@@ -156,3 +227,10 @@ class SortedBag(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the sorted bag list with its status/destination filters
+            models.Index(fields=['created_at', 'id'], name='sorted_created_idx'),
+            models.Index(fields=['status', 'destination', 'created_at', 'id'], name='sorted_status_dest_created_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='sorted_status_created_idx'),
+            models.Index(fields=['destination', 'created_at', 'id'], name='sorted_dest_created_idx'),
+        ]
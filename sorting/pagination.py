@@ -0,0 +1,135 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+
+def encode_cursor(obj, fields):
+    """Encode the keyset values of ``obj`` into an opaque, URL-safe cursor"""
+    values = [getattr(obj, field) for field in fields]
+    payload = json.dumps([v.isoformat() if hasattr(v, 'isoformat') else v for v in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model, fields):
+    """Decode a cursor back into typed keyset values, raising ValueError if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw_values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(raw_values, list) or len(raw_values) != len(fields):
+        raise ValueError('Invalid cursor')
+    try:
+        return [model._meta.get_field(field).to_python(value) for field, value in zip(fields, raw_values)]
+    except (ValidationError, TypeError, ValueError):
+        # e.g. a number or an object where the cursor should hold a timestamp string
+        raise ValueError('Invalid cursor')
+
+
+def keyset_filter(fields, values):
+    """Build a filter selecting rows strictly after ``values`` in descending ``fields`` order"""
+    condition = Q()
+    for i in range(len(fields) - 1, -1, -1):
+        step = Q(**{f'{fields[i]}__lt': values[i]})
+        if i < len(fields) - 1:
+            step |= Q(**{fields[i]: values[i]}) & condition
+        condition = step
+    # The redundant bound on the leading field lets the database seek the index
+    # instead of walking it from the top and discarding rows.
+    return Q(**{f'{fields[0]}__lte': values[0]}) & condition
+
+
+def keyset_page(queryset, fields, cursor, page_size):
+    """
+    Return one page of ``queryset`` ordered by ``fields`` descending, starting after
+    ``cursor``, together with the cursor of the next page (None on the last page).
+    """
+    queryset = queryset.order_by(*[f'-{field}' for field in fields])
+    if cursor:
+        values = decode_cursor(cursor, queryset.model, fields)
+        queryset = queryset.filter(keyset_filter(fields, values))
+
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor(items[-1], fields)
+    return items, next_cursor
+
+
+class KeysetPaginationMixin:
+    """
+    ListView mixin replacing OFFSET pagination with keyset pagination, so every page
+    costs the same regardless of how deep the user scrolls.
+    """
+    paginate_by = 50
+    cursor_kwarg = 'cursor'
+    keyset_fields = ('received_at', 'id')
+    next_cursor = None
+
+    def paginate_queryset(self, queryset, page_size):
+        try:
+            items, self.next_cursor = keyset_page(
+                queryset, self.keyset_fields, self.request.GET.get(self.cursor_kwarg), page_size
+            )
+        except ValueError:
+            raise Http404('Invalid cursor')
+        return None, None, items, self.next_cursor is not None
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['next_cursor'] = self.next_cursor
+        return context
+
+
+def estimated_row_count(model, using='default'):
+    """
+    The database's cheap estimate of the rows in ``model``'s table, or None without one:
+    the planner statistics on PostgreSQL, ANALYZE statistics or else the highest rowid on SQLite.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            row = cursor.fetchone()
+            # -1 until the table has been vacuumed or analyzed
+            return row[0] if row and row[0] >= 0 else None
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [table])
+                # The first figure is the rows in the index; partial indexes hold fewer
+                estimate = max((int(stat.split()[0]) for stat, in cursor.fetchall()), default=None)
+            except DatabaseError:
+                # No sqlite_stat1 before the first ANALYZE
+                estimate = None
+            if estimate is None:
+                cursor.execute(f'SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}')
+                estimate = cursor.fetchone()[0] or 0
+            return estimate
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for very large tables. An unfiltered list takes the database's row estimate
+    once that reaches ``exact_below``; anything else is counted up to ``count_limit`` rows,
+    so no page load counts millions of rows and the pages past the limit are not linked.
+    """
+    exact_below = 10000
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.has_filters():
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.exact_below:
+                return estimate
+        return queryset[:self.count_limit].count()
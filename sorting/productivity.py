@@ -0,0 +1,89 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Count, Max, Min, Sum
+from django.utils import timezone
+
+from .models import Bag, DailyProduction
+
+
+def current_shift(now=None):
+    """(start, end) of the SORTING_SHIFTS shift running at ``now``, as aware datetimes"""
+    now = timezone.localtime(now)
+    for start, end in settings.SORTING_SHIFTS:
+        start, end = time.fromisoformat(start), time.fromisoformat(end)
+        for day in (now.date(), now.date() - timedelta(days=1)):
+            shift_start = timezone.make_aware(datetime.combine(day, start))
+            shift_end = timezone.make_aware(datetime.combine(day if end > start else day + timedelta(days=1), end))
+            if shift_start <= now < shift_end:
+                return shift_start, shift_end
+    # Outside every shift: count from the start of the day
+    start_of_day = timezone.make_aware(datetime.combine(now.date(), time.min))
+    return start_of_day, start_of_day + timedelta(days=1)
+
+
+def period_metrics(bags=0, weight=None, hours=0.0):
+    return {
+        'bags': bags,
+        'weight_kg': weight or 0,
+        # Hours between the first and the last bag; too short a span says nothing about the pace
+        'bags_per_hour': round(bags / hours, 1) if hours >= settings.PRODUCTIVITY_MIN_HOURS else None,
+    }
+
+
+def empty_metrics():
+    return {'today': period_metrics(), 'shift': period_metrics(), 'week': period_metrics()}
+
+
+def span_hours(first, last):
+    return (last - first).total_seconds() / 3600 if first and last else 0.0
+
+
+def personnel_metrics(now=None):
+    """
+    Bags, kg and bags per hour of every sorting person for today, the current shift and the
+    last 7 days: {person id: {'today': ..., 'shift': ..., 'week': ...}}. Days come from the
+    DailyProduction rollup, the shift from one grouped query over the bags received in it.
+    """
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    shift_start, _ = current_shift(now)
+
+    days = DailyProduction.objects.filter(
+        day__range=(today - timedelta(days=6), today),
+        sorting_person__isnull=False,
+    ).values('sorting_person_id', 'day').annotate(
+        bags=Sum('bag_count'),
+        weight=Sum('total_weight_kg'),
+        first=Min('first_received_at'),
+        last=Max('last_received_at'),
+    ).order_by()
+
+    week = defaultdict(lambda: {'bags': 0, 'weight': 0, 'hours': 0.0})
+    metrics = defaultdict(empty_metrics)
+    for row in days:
+        hours = span_hours(row['first'], row['last'])
+        totals = week[row['sorting_person_id']]
+        totals['bags'] += row['bags']
+        totals['weight'] += row['weight']
+        totals['hours'] += hours
+        if row['day'] == today:
+            metrics[row['sorting_person_id']]['today'] = period_metrics(row['bags'], row['weight'], hours)
+    for person_id, totals in week.items():
+        metrics[person_id]['week'] = period_metrics(totals['bags'], totals['weight'], totals['hours'])
+
+    shift = Bag.objects.filter(
+        received_at__gte=shift_start,
+        sorting_person__isnull=False,
+    ).values('sorting_person_id').annotate(
+        bags=Count('id'),
+        weight=Sum('weight_kg'),
+        first=Min('received_at'),
+        last=Max('received_at'),
+    ).order_by()
+    for row in shift:
+        metrics[row['sorting_person_id']]['shift'] = period_metrics(
+            row['bags'], row['weight'], span_hours(row['first'], row['last'])
+        )
+    return metrics
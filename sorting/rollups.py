@@ -0,0 +1,169 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DateTimeField, F, Max, Min, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least, TruncDate
+from django.utils import timezone
+
+from .models import Bag, DailyProduction
+
+
+# Bag attributes that decide which DailyProduction row a bag is counted in
+ROLLUP_FIELDS = ('received_at', 'socket_id', 'bag_type_id', 'bag_subtype_id', 'extra', 'sorting_person_id', 'weight_kg')
+KEY_FIELDS = ('day', 'socket_id', 'bag_type_id', 'bag_subtype_id', 'extra', 'sorting_person_id')
+
+
+def bag_state(bag):
+    return {field: getattr(bag, field) for field in ROLLUP_FIELDS}
+
+
+def loaded_state(bag):
+    """The rollup attributes the bag was last counted with, or None if unknown"""
+    counted = getattr(bag, '_rollup_state', None)
+    if counted is not None:
+        return counted
+    loaded = getattr(bag, '_loaded_values', None)
+    if loaded is None or any(field not in loaded for field in ROLLUP_FIELDS):
+        return None
+    return {field: loaded[field] for field in ROLLUP_FIELDS}
+
+
+def rollup_key(state):
+    return (
+        timezone.localdate(state['received_at']),
+        state['socket_id'],
+        state['bag_type_id'],
+        state['bag_subtype_id'],
+        bool(state['extra']),
+        state['sorting_person_id'],
+    )
+
+
+def rollup_weight(state):
+    weight = state['weight_kg']
+    return Decimal(str(weight)) if weight is not None else Decimal('0')
+
+
+def new_changes():
+    """Deltas per rollup key: [bag_count, weight, first and last received_at of the added bags]"""
+    return defaultdict(lambda: [0, Decimal('0'), None, None])
+
+
+def add_change(changes, state, sign):
+    change = changes[rollup_key(state)]
+    change[0] += sign
+    change[1] += sign * rollup_weight(state)
+    if sign > 0:
+        received_at = state['received_at']
+        change[2] = min(change[2] or received_at, received_at)
+        change[3] = max(change[3] or received_at, received_at)
+
+
+def widen(field, value, function):
+    """Expression moving a nullable datetime column to ``value`` if that is further out"""
+    value = Value(value, output_field=DateTimeField())
+    return function(Coalesce(F(field), value), value)
+
+
+def apply_changes(changes):
+    """Add the deltas from new_changes() to the matching DailyProduction rows"""
+    with transaction.atomic(savepoint=False):
+        for key, (bag_count, weight, first, last) in changes.items():
+            if not bag_count and not weight:
+                continue
+            filters = dict(zip(KEY_FIELDS, key))
+            update = {
+                'bag_count': F('bag_count') + bag_count,
+                'total_weight_kg': F('total_weight_kg') + weight,
+            }
+            if first is not None:
+                # Removed bags do not narrow the span; a rebuild does
+                update['first_received_at'] = widen('first_received_at', first, Least)
+                update['last_received_at'] = widen('last_received_at', last, Greatest)
+            # Only one row takes the delta, in case a concurrent insert split the key
+            row = DailyProduction.objects.filter(**filters).values('pk')[:1]
+            updated = DailyProduction.objects.filter(pk__in=Subquery(row)).update(**update)
+            if updated:
+                continue
+            if bag_count > 0:
+                # Nothing to subtract from means the row was deleted with its socket or type
+                DailyProduction.objects.create(
+                    bag_count=bag_count,
+                    total_weight_kg=weight,
+                    first_received_at=first,
+                    last_received_at=last,
+                    **filters,
+                )
+
+
+def record_bags(bags, sign=1):
+    """Count bags that were created (or deleted, with sign=-1) without signals, e.g. by bulk_create"""
+    changes = new_changes()
+    for bag in bags:
+        add_change(changes, bag_state(bag), sign)
+    apply_changes(changes)
+
+
+def record_bag_save(bag, created):
+    state = bag_state(bag)
+    changes = new_changes()
+    if created:
+        add_change(changes, state, 1)
+    else:
+        previous = loaded_state(bag)
+        if previous is None:
+            # Loaded with deferred fields, so the old row is unknown
+            day = timezone.localdate(state['received_at'])
+            rebuild_daily_production(day, day)
+            bag._rollup_state = state
+            return
+        if previous == state:
+            return
+        add_change(changes, previous, -1)
+        add_change(changes, state, 1)
+    apply_changes(changes)
+    # Our own snapshot for the next save; _loaded_values stays as loaded for other receivers
+    bag._rollup_state = state
+
+
+def record_bag_delete(bag):
+    changes = new_changes()
+    add_change(changes, loaded_state(bag) or bag_state(bag), -1)
+    apply_changes(changes)
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def rebuild_daily_production(start=None, end=None):
+    """Recompute DailyProduction from Bag for the days from ``start`` to ``end`` (inclusive)"""
+    bags = Bag.objects.all()
+    rollups = DailyProduction.objects.all()
+    # Bounds on received_at itself rather than its date, so that the index is used
+    if start is not None:
+        bags = bags.filter(received_at__gte=start_of_day(start))
+        rollups = rollups.filter(day__gte=start)
+    if end is not None:
+        bags = bags.filter(received_at__lt=start_of_day(end + timedelta(days=1)))
+        rollups = rollups.filter(day__lte=end)
+
+    rows = bags.annotate(day=TruncDate('received_at')).values(*KEY_FIELDS).annotate(
+        bag_count=Count('id'),
+        total_weight_kg=Sum('weight_kg'),
+        first_received_at=Min('received_at'),
+        last_received_at=Max('received_at'),
+    ).order_by()
+
+    with transaction.atomic():
+        rollups.delete()
+        created = DailyProduction.objects.bulk_create(
+            [
+                DailyProduction(**{**row, 'total_weight_kg': row['total_weight_kg'] or 0})
+                for row in rows.iterator()
+            ],
+            batch_size=1000,
+        )
+    return len(created)
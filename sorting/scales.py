@@ -0,0 +1,295 @@
+"""
+Weight-scale ingestion for `manage.py ingest_scales`. Scales send their display as text
+lines over TCP or a serial line (or come from a simulated scale); a weighing is a load that
+has held still for SCALE_SETTLE_SECONDS. Weighings go either to the entry wizard, as the
+pending reading of the scale's socket that the weight step picks up, or straight into the
+bulk bag path as new bags.
+"""
+import asyncio
+import random
+import re
+import uuid
+from decimal import Decimal, InvalidOperation
+from urllib.parse import parse_qs, urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, close_old_connections
+from django.utils import timezone
+
+from .catalog import get_catalog
+
+
+# Seconds between attempts to reach a scale that dropped its connection
+RECONNECT_DELAY = 5
+
+# "ST,GS,+0012.50kg", "US,NT,-0000.10 kg", "12.5"; ST/US mark stable and unstable readings
+READING_RE = re.compile(r'^\s*(?:(?P<status>ST|US|OL)\W+)?(?:[A-Z]{2}\W+)?(?P<weight>[+-]?\s*\d+(?:[.,]\d+)?)\s*(?P<unit>kg|g)?\s*$', re.I)
+
+
+class InvalidScaleURL(ValueError):
+    pass
+
+
+def parse_reading(line):
+    """``(weight_kg, stable)`` of one scale line, stable None if the scale does not say; None for other lines"""
+    match = READING_RE.match(line)
+    if match is None or (match['status'] or '').upper() == 'OL':
+        return None
+    try:
+        weight = Decimal(re.sub(r'\s', '', match['weight']).replace(',', '.'))
+    except InvalidOperation:
+        return None
+    if (match['unit'] or 'kg').lower() == 'g':
+        weight /= 1000
+    status = (match['status'] or '').upper()
+    return weight.quantize(Decimal('0.01')), (status == 'ST') if status else None
+
+
+class WeighingDetector:
+    """
+    Turns readings into weighings: a load of at least ``min_kg`` that stayed within
+    ``tolerance_kg`` for ``settle_seconds`` is reported once, and the next weighing waits
+    until the scale has been unloaded below ``min_kg``.
+    """
+
+    def __init__(self, settle_seconds, tolerance_kg, min_kg):
+        self.settle_seconds = settle_seconds
+        self.tolerance_kg = Decimal(tolerance_kg)
+        self.min_kg = Decimal(min_kg)
+        self.reset()
+
+    def reset(self):
+        self.reference = None
+        self.settled_since = None
+        self.weighed = False
+
+    def feed(self, weight_kg, stable, now):
+        """The weighing completed by this reading (taken at ``now`` seconds), if any"""
+        if weight_kg < self.min_kg:
+            self.reset()
+            return None
+        if self.weighed:
+            return None
+        if stable is False or self.reference is None or abs(weight_kg - self.reference) > self.tolerance_kg:
+            self.reference = None if stable is False else weight_kg
+            self.settled_since = now
+            return None
+        if now - self.settled_since < self.settle_seconds:
+            return None
+        self.weighed = True
+        return weight_kg
+
+
+# Pending readings for the entry wizard, one per socket (Socket.pk)
+
+def reading_cache_key(socket_pk):
+    return f'sorting:scale:{socket_pk}'
+
+
+def publish_reading(socket_pk, weight_kg):
+    """Offer ``weight_kg`` to the next weight step of the socket, replacing an unused reading"""
+    reading = {'key': uuid.uuid4().hex, 'weight_kg': str(weight_kg), 'read_at': timezone.now().isoformat()}
+    caches[settings.BAG_WIZARD_CACHE].set(reading_cache_key(socket_pk), reading, settings.SCALE_READING_TTL)
+    return reading
+
+
+def pending_reading(socket_pk):
+    return caches[settings.BAG_WIZARD_CACHE].get(reading_cache_key(socket_pk))
+
+
+def consume_reading(socket_pk, key):
+    """Remove the socket's pending reading once a bag used it; False if it was replaced since"""
+    reading = pending_reading(socket_pk)
+    if reading is None or reading['key'] != key:
+        return False
+    caches[settings.BAG_WIZARD_CACHE].delete(reading_cache_key(socket_pk))
+    return True
+
+
+class WizardSink:
+    """Hands every weighing to the entry wizard of its socket"""
+
+    async def deliver(self, socket, weight_kg):
+        await sync_to_async(publish_reading)(socket.pk, weight_kg)
+        return f'{socket.socket_id}: {weight_kg} kg waiting for the weight step'
+
+
+class BulkBagSink:
+    """
+    Saves every weighing as a bag of ``bag_type`` (its code) through the bulk bag path.
+    Weighings that arrive while a batch is being saved go into the next batch, and each
+    carries a client_key, so a batch retried after a database error is stored once.
+    """
+
+    def __init__(self, bag_type):
+        self.bag_type = bag_type
+        self.queue = asyncio.Queue()
+
+    async def deliver(self, socket, weight_kg):
+        await self.queue.put({
+            'socket': socket.socket_id,
+            'bag_type': self.bag_type,
+            'weight_kg': str(weight_kg),
+            'client_key': f'scale-{uuid.uuid4().hex}',
+        })
+        return f'{socket.socket_id}: {weight_kg} kg queued as a {self.bag_type} bag'
+
+    async def run(self, report):
+        while True:
+            records = [await self.queue.get()]
+            while not self.queue.empty() and len(records) < settings.BULK_BAG_MAX_BATCH:
+                records.append(self.queue.get_nowait())
+            while True:
+                try:
+                    results = await sync_to_async(save_scale_records)(records)
+                    break
+                except DatabaseError as error:
+                    report(f'Saving {len(records)} weighings failed ({error}), retrying')
+                    await asyncio.sleep(RECONNECT_DELAY)
+            retrying = False
+            for record, result in zip(records, results):
+                if result['status'] == 'error':
+                    report(f"{record['socket']}: {record['weight_kg']} kg rejected: {result['errors']}")
+                elif result['status'] == 'retry':
+                    report(f"{record['socket']}: {record['weight_kg']} kg not stored yet, retrying")
+                    self.queue.put_nowait(record)
+                    retrying = True
+                else:
+                    report(f"{record['socket']}: {record['weight_kg']} kg saved as {result['bag_id']}")
+            for _ in records:
+                self.queue.task_done()
+            if retrying:
+                await asyncio.sleep(RECONNECT_DELAY)
+
+
+def save_scale_records(records):
+    # views imports this module for the weight step
+    from .views import save_bag_records
+
+    close_old_connections()
+    return save_bag_records(records, get_catalog())[0]
+
+
+# Scale streams
+
+def check_scale_url(url):
+    """Raise InvalidScaleURL unless ``url`` is tcp://host:port, serial:///dev/... or sim://"""
+    parts = urlsplit(url)
+    if parts.scheme == 'tcp' and parts.hostname and parts.port:
+        return
+    if parts.scheme == 'serial' and parts.path:
+        return
+    if parts.scheme == 'sim':
+        return
+    raise InvalidScaleURL(f'Unsupported scale URL {url!r}; use tcp://host:port, serial:///dev/... or sim://')
+
+
+async def scale_lines(url):
+    """Lines sent by the scale at ``url``, until it disconnects"""
+    parts = urlsplit(url)
+    if parts.scheme == 'sim':
+        options = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        async for line in simulated_lines(
+            seed=options.get('seed'), interval=float(options.get('interval', 0.2))
+        ):
+            yield line
+        return
+
+    if parts.scheme == 'tcp':
+        reader, connection = await asyncio.open_connection(parts.hostname, parts.port)
+    else:
+        # The line settings (baud rate, parity) are left to the device, e.g. `stty -F /dev/ttyUSB0 9600 raw`
+        reader = asyncio.StreamReader()
+        device = open(parts.path, 'rb', buffering=0)
+        connection, _ = await asyncio.get_running_loop().connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), device
+        )
+    try:
+        while line := await reader.readline():
+            yield line.decode('ascii', 'replace').strip()
+    finally:
+        connection.close()
+
+
+async def simulated_lines(seed=None, interval=0.2):
+    """
+    An endless simulated scale: an empty platform, a bag being put down (unstable readings
+    around its weight), the bag at rest with the odd jitter, and the bag taken off again
+    """
+    rng = random.Random(seed)
+    cent = Decimal('0.01')
+
+    def line(status, weight):
+        return f'{status},GS,{weight:+08.2f}kg'
+
+    while True:
+        for _ in range(rng.randint(3, 8)):
+            yield line('ST', Decimal('0.00'))
+            await asyncio.sleep(interval)
+        weight = Decimal(rng.uniform(3, 40)).quantize(cent)
+        for _ in range(rng.randint(2, 5)):
+            yield line('US', weight + Decimal(rng.uniform(-1, 1)).quantize(cent))
+            await asyncio.sleep(interval)
+        for _ in range(rng.randint(15, 25)):
+            yield line('ST', weight + rng.choice((0, 0, 0, cent, -cent)))
+            await asyncio.sleep(interval)
+
+
+async def run_scale(socket, url, detector, sink, report, limit=None):
+    """
+    Read the scale at ``url`` for ``socket`` and deliver its weighings to ``sink``,
+    reconnecting when the scale drops out. Returns after ``limit`` weighings, if given.
+    """
+    loop = asyncio.get_running_loop()
+    delivered = 0
+    while True:
+        detector.reset()
+        try:
+            async for line in scale_lines(url):
+                reading = parse_reading(line)
+                if reading is None:
+                    continue
+                weight_kg = detector.feed(*reading, loop.time())
+                if weight_kg is None:
+                    continue
+                report(await sink.deliver(socket, weight_kg))
+                delivered += 1
+                if limit is not None and delivered >= limit:
+                    return
+            report(f'{socket.socket_id}: scale at {url} disconnected')
+        except OSError as error:
+            report(f'{socket.socket_id}: scale at {url} unavailable ({error})')
+        await asyncio.sleep(RECONNECT_DELAY)
+
+
+async def ingest(scales, sink, report, settle_seconds, tolerance_kg, min_kg, limit=None):
+    """
+    Run every scale of ``scales`` (socket, url pairs) until each has delivered ``limit``
+    weighings, or forever. If the sink stops saving, the scales stop too and its error is raised.
+    """
+    saver = asyncio.create_task(sink.run(report)) if hasattr(sink, 'run') else None
+    readers = asyncio.gather(*(
+        run_scale(socket, url, WeighingDetector(settle_seconds, tolerance_kg, min_kg), sink, report, limit)
+        for socket, url in scales
+    ))
+    try:
+        if saver is None:
+            await readers
+            return
+        await asyncio.wait([readers, saver], return_when=asyncio.FIRST_COMPLETED)
+        if not saver.done():
+            readers.result()
+            # Wait for the last batch, unless saving fails meanwhile
+            await asyncio.wait([asyncio.ensure_future(sink.queue.join()), saver], return_when=asyncio.FIRST_COMPLETED)
+        if saver.done():
+            # Only database errors are retried; anything else would leave weighings piling up unsaved
+            report(f'Saving weighings failed, stopping: {saver.exception()!r}')
+            saver.result()
+    finally:
+        readers.cancel()
+        if saver is not None:
+            saver.cancel()
+        # Collect the cancelled tasks so their outcome is not reported as never retrieved
+        await asyncio.gather(readers, *([saver] if saver else []), return_exceptions=True)
@@ -0,0 +1,181 @@
+"""
+Full-text search over bag IDs, notes and bag type and subtype names.
+
+The documents live in the sorting_bag_search table (migration 0022), one per bag and keyed
+by its primary key. On SQLite it is an FTS5 table with the trigram tokenizer, so any
+fragment of three or more characters matches; on PostgreSQL it holds a tsvector under a
+GIN index and terms match word prefixes. Bag signals keep it current; code that writes
+bags without signals (bulk_create, update) calls index_bags() itself.
+"""
+import re
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import QuerySet, Value
+from django.db.models.functions import Coalesce
+
+from .models import Bag
+
+
+SEARCH_TABLE = 'sorting_bag_search'
+# Trigram matching needs three characters; shorter terms would match nothing
+MIN_TERM_LENGTH = 3
+# Bags reindexed per transaction after a bag type or subtype change, so that station
+# inserts get the write lock in between
+REINDEX_BATCH_SIZE = 2000
+
+
+# tsvector of a document's bag_id, notes, bag type and subtype; IDs are split into their parts
+PG_DOCUMENT = "to_tsvector('simple', concat_ws(' ', translate({}, '_-', '  '), {}, {}, {}))"
+
+
+def document_rows(bags):
+    """SQL and params selecting (id, bag_id, notes, bag type, subtype) of the ``bags`` queryset"""
+    rows = bags.order_by().values_list(
+        'id', 'bag_id', 'notes', 'bag_type__name', Coalesce('bag_subtype__name', Value(''))
+    )
+    return rows.query.sql_with_params()
+
+
+def document_values(bag):
+    return (bag.pk, bag.bag_id, bag.notes, bag.bag_type.name, bag.bag_subtype.name if bag.bag_subtype else '')
+
+
+def index_bags(bags, created=False):
+    """
+    (Re)index ``bags``: a Bag queryset, or Bag instances saved without signals. The
+    documents of instances come from their own bag type and subtype, and those of new
+    bags (``created``) are only inserted, so indexing a new bag is a single statement.
+    """
+    if isinstance(bags, QuerySet):
+        index_bag_rows(connections[bags.db], *document_rows(bags))
+        return
+    index_documents([document_values(bag) for bag in bags], created)
+
+
+def index_documents(rows, created=False, using='default'):
+    """Index (id, bag_id, notes, bag type, subtype) rows, as built by document_values()"""
+    if not rows:
+        return
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (id, document) VALUES (%s, {PG_DOCUMENT.format(*['%s'] * 4)}) "
+                f"ON CONFLICT (id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+        else:
+            if not created:
+                cursor.executemany(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [row[:1] for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, bag_id, notes, bag_type, bag_subtype) VALUES (%s, %s, %s, %s, %s)',
+                rows,
+            )
+
+
+def index_bag_rows(connection, sql, params):
+    """Index the bags selected by ``sql``, as built by document_rows()"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (id, document) "
+                f"SELECT id, {PG_DOCUMENT.format('bag_id', 'notes', 'bag_type', 'bag_subtype')} "
+                f"FROM ({sql}) AS bags (id, bag_id, notes, bag_type, bag_subtype) "
+                f"ON CONFLICT (id) DO UPDATE SET document = EXCLUDED.document",
+                params,
+            )
+        else:
+            # FTS5 has no upsert; replace the documents instead
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN (SELECT id FROM ({sql}))', params)
+            cursor.execute(f'INSERT INTO {SEARCH_TABLE} (rowid, bag_id, notes, bag_type, bag_subtype) {sql}', params)
+
+
+def unindex_bags(ids, using='default'):
+    if not ids:
+        return
+    connection = connections[using]
+    key = 'id' if connection.vendor == 'postgresql' else 'rowid'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE {key} IN ({', '.join(['%s'] * len(ids))})", list(ids)
+        )
+
+
+def index_in_batches(bags, batch_size=REINDEX_BATCH_SIZE, progress=None):
+    """
+    Reindex the ``bags`` queryset in primary key batches, each in its own transaction,
+    calling ``progress(indexed)`` after each. Returns the count.
+    """
+    indexed = 0
+    last_id = 0
+    while True:
+        ids = list(bags.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return indexed
+        with transaction.atomic(using=bags.db):
+            index_bags(bags.filter(pk__gte=ids[0], pk__lte=ids[-1]))
+        indexed += len(ids)
+        last_id = ids[-1]
+        if progress:
+            progress(indexed)
+
+
+def reindex_bag_ids(ids, batch_size=REINDEX_BATCH_SIZE):
+    """Reindex the bags with primary keys ``ids``, a batch per transaction"""
+    for start in range(0, len(ids), batch_size):
+        with transaction.atomic():
+            index_bags(Bag.objects.filter(pk__in=ids[start:start + batch_size]))
+
+
+def rebuild_bag_search(batch_size=10000, progress=None):
+    """Reindex every bag in primary key batches, calling ``progress(indexed)`` after each. Returns the count."""
+    connection = connections['default']
+    with connection.cursor() as cursor:
+        cursor.execute(f"{'TRUNCATE' if connection.vendor == 'postgresql' else 'DELETE FROM'} {SEARCH_TABLE}")
+    return index_in_batches(Bag.objects.all(), batch_size, progress)
+
+
+def search_terms(query):
+    return [term for term in query.split() if len(term) >= MIN_TERM_LENGTH]
+
+
+def search_bags(query, page=1, page_size=50):
+    """
+    One page of the bags matching every term of ``query``, best match first, and whether
+    a next page exists. Only the newest BAG_SEARCH_CANDIDATES matches are ranked, so a
+    term found in millions of bags costs the same as a rare one.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return [], False
+
+    connection = connections['default']
+    if connection.vendor == 'postgresql':
+        lexemes = [lexeme for term in terms for lexeme in re.findall(r'[^\W_]+', term.lower())]
+        if not lexemes:
+            return [], False
+        sql = (
+            f"SELECT id FROM ("
+            f"  SELECT id, ts_rank(document, query) AS rank"
+            f"  FROM {SEARCH_TABLE}, to_tsquery('simple', %s) AS query"
+            f"  WHERE document @@ query ORDER BY id DESC LIMIT %s"
+            f") AS candidates ORDER BY rank DESC, id DESC LIMIT %s OFFSET %s"
+        )
+        match = ' & '.join(f'{lexeme}:*' for lexeme in lexemes)
+    else:
+        # bm25 rank: lower is better
+        sql = (
+            f"SELECT id FROM ("
+            f"  SELECT rowid AS id, rank FROM {SEARCH_TABLE}"
+            f"  WHERE {SEARCH_TABLE} MATCH %s ORDER BY rowid DESC LIMIT %s"
+            f") ORDER BY rank, id DESC LIMIT %s OFFSET %s"
+        )
+        match = ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, settings.BAG_SEARCH_CANDIDATES, page_size + 1, (page - 1) * page_size])
+        ids = [row[0] for row in cursor.fetchall()]
+
+    bags = Bag.objects.select_related('socket', 'bag_type', 'bag_subtype').in_bulk(ids[:page_size])
+    return [bags[pk] for pk in ids[:page_size] if pk in bags], len(ids) > page_size
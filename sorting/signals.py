@@ -0,0 +1,129 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from .catalog import bump_catalog_version
+from .counters import adjust_dashboard_counters, bag_counter_deltas, invalidate_dashboard_counters
+from .models import Socket, Bag, SortedBag, SortingPerson, BagType, BagSubtype
+from .rollups import record_bag_save, record_bag_delete
+from .search import index_bags, index_in_batches, reindex_bag_ids, unindex_bags
+
+
+# Dashboard counters are adjusted in place, so steady intake does not force a recompute
+# on every dashboard load
+
+@receiver(post_save, sender=Bag)
+def count_bag_save(sender, instance, created, **kwargs):
+    processed = bool(instance.is_processed)
+    if created:
+        adjust_dashboard_counters(**bag_counter_deltas(processed))
+    else:
+        counted = getattr(instance, '_counted_processed', None)
+        if counted is None:
+            counted = (getattr(instance, '_loaded_values', None) or {}).get('is_processed')
+        if counted is None:
+            # Loaded without is_processed, so whether it changed is unknown
+            invalidate_dashboard_counters()
+        elif bool(counted) != processed:
+            adjust_dashboard_counters(
+                processed_bags=1 if processed else -1, pending_bags=-1 if processed else 1
+            )
+    instance._counted_processed = processed
+
+
+@receiver(post_delete, sender=Bag)
+def count_bag_delete(sender, instance, **kwargs):
+    counted = getattr(instance, '_counted_processed', None)
+    if counted is None:
+        counted = (getattr(instance, '_loaded_values', None) or {}).get('is_processed', instance.is_processed)
+    adjust_dashboard_counters(**bag_counter_deltas(counted, -1))
+
+
+@receiver(post_save, sender=SortedBag)
+@receiver(post_delete, sender=SortedBag)
+@receiver(post_save, sender=SortingPerson)
+@receiver(post_delete, sender=SortingPerson)
+def count_rows(sender, created=None, **kwargs):
+    counter = 'sorted_bags' if sender is SortedBag else 'active_personnel'
+    if created is None:
+        adjust_dashboard_counters(**{counter: -1})
+    elif created:
+        adjust_dashboard_counters(**{counter: 1})
+
+
+@receiver(post_save, sender=Socket)
+@receiver(post_delete, sender=Socket)
+def reset_dashboard_counters(sender, **kwargs):
+    # Rare, and deleting a socket takes its bags with it
+    invalidate_dashboard_counters()
+
+
+@receiver(post_save, sender=Socket)
+@receiver(post_delete, sender=Socket)
+@receiver(post_save, sender=BagType)
+@receiver(post_delete, sender=BagType)
+@receiver(post_save, sender=BagSubtype)
+@receiver(post_delete, sender=BagSubtype)
+def reset_catalog(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Bag)
+def update_daily_production(sender, instance, created, **kwargs):
+    record_bag_save(instance, created)
+
+
+@receiver(post_delete, sender=Bag)
+def remove_from_daily_production(sender, instance, **kwargs):
+    record_bag_delete(instance)
+
+
+# Bag fields that go into its search document
+SEARCH_FIELDS = ('bag_id', 'notes', 'bag_type_id', 'bag_subtype_id')
+
+
+@receiver(post_save, sender=Bag)
+def update_search_index(sender, instance, created, **kwargs):
+    # The values last indexed: our own snapshot after a save, otherwise those loaded from the row
+    indexed = getattr(instance, '_indexed_state', None) or getattr(instance, '_loaded_values', None)
+    state = {field: getattr(instance, field) for field in SEARCH_FIELDS}
+    if created or indexed is None or any(field not in indexed or indexed[field] != state[field] for field in SEARCH_FIELDS):
+        index_bags([instance], created=created)
+    instance._indexed_state = state
+
+
+@receiver(post_delete, sender=Bag)
+def remove_from_search_index(sender, instance, **kwargs):
+    unindex_bags([instance.pk], using=kwargs.get('using', 'default'))
+
+
+@receiver(pre_save, sender=BagType)
+@receiver(pre_save, sender=BagSubtype)
+def remember_indexed_name(sender, instance, **kwargs):
+    instance._indexed_name = sender.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=BagType)
+@receiver(post_save, sender=BagSubtype)
+def reindex_renamed(sender, instance, created, **kwargs):
+    """
+    The name is in the search documents of every bag of the type or subtype. They are
+    reindexed once the rename has committed, in batches of their own transactions, so
+    the write lock is never held for the whole type.
+    """
+    if not created and instance.name != getattr(instance, '_indexed_name', instance.name):
+        bags = Bag.objects.filter(**{'bag_type_id' if sender is BagType else 'bag_subtype_id': instance.pk})
+        transaction.on_commit(lambda: index_in_batches(bags))
+
+
+@receiver(pre_delete, sender=BagSubtype)
+def remember_subtype_bags(sender, instance, **kwargs):
+    # Collected before the delete sets their subtype to NULL
+    instance._bag_pks = list(Bag.objects.filter(bag_subtype_id=instance.pk).values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=BagSubtype)
+def reindex_subtype_deleted(sender, instance, **kwargs):
+    bag_pks = getattr(instance, '_bag_pks', [])
+    if bag_pks:
+        transaction.on_commit(lambda: reindex_bag_ids(bag_pks))
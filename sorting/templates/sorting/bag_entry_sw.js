@@ -0,0 +1,43 @@
+// Service worker of the quick bag entry page (see BagEntryServiceWorkerView)
+const CACHE = 'bag-entry-v1';
+const NETWORK_FIRST = ['{% url "sorting:quick_bag_entry" %}', '{% url "sorting:catalog" %}'];
+const CACHE_FIRST = ['style', 'script', 'font', 'image'];
+
+self.addEventListener('install', () => self.skipWaiting());
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys.filter(key => key !== CACHE).map(key => caches.delete(key))))
+            .then(() => self.clients.claim())
+    );
+});
+
+function store(request, response) {
+    // Opaque CDN responses cannot be inspected, keep them as they are
+    if (response.ok || response.type === 'opaque') {
+        const copy = response.clone();
+        caches.open(CACHE).then(cache => cache.put(request, copy));
+    }
+    return response;
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') {
+        return;
+    }
+    const url = new URL(request.url);
+
+    if (url.origin === location.origin && NETWORK_FIRST.includes(url.pathname)) {
+        // Current page and catalog while online, the last copy while offline. A redirect
+        // means the session expired: pass it on but do not cache the login page.
+        event.respondWith(
+            fetch(request)
+                .then(response => response.redirected ? response : store(request, response))
+                .catch(() => caches.match(request, { ignoreSearch: true }))
+        );
+    } else if (CACHE_FIRST.includes(request.destination)) {
+        event.respondWith(caches.match(request).then(cached => cached || fetch(request).then(response => store(request, response))));
+    }
+});
@@ -0,0 +1,191 @@
+"""
+Request timing: wall time, SQL count and SQL time of every request, sent back in a
+Server-Timing header and kept in a rolling in-memory window per URL name for the
+performance page. The figures are per process; each server worker keeps its own.
+"""
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_started
+from django.db import connections
+
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Timing of the request being handled; copied into the threads async views run queries in
+current_timing = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """SQL of one request: query count, time and per-statement totals"""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.statements = {}
+
+    def add(self, sql, elapsed_ms):
+        self.queries += 1
+        self.sql_ms += elapsed_ms
+        count, total_ms, max_ms = self.statements.get(sql, (0, 0.0, 0.0))
+        self.statements[sql] = (count + 1, total_ms + elapsed_ms, max(max_ms, elapsed_ms))
+
+
+def record_sql(execute, sql, params, many, context):
+    """Database execute wrapper timing the queries made while a request is measured"""
+    timing = current_timing.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.add(sql, (time.perf_counter() - started) * 1000)
+
+
+def install_sql_wrappers(**kwargs):
+    """
+    Put record_sql on the connections of the current thread. Connected to request_started,
+    which runs in the thread the request's queries run in, async views included.
+    """
+    for connection in connections.all():
+        # In front, so that the last wrapper stays the one a surrounding execute_wrapper() pops
+        if record_sql not in connection.execute_wrappers:
+            connection.execute_wrappers.insert(0, record_sql)
+
+
+def percentile(values, fraction):
+    return values[max(0, round(len(values) * fraction) - 1)]
+
+
+class TimingStats:
+    """
+    The last ``window`` requests of every URL name and the statements that took the most
+    database time overall, at most ``max_queries`` of them.
+    """
+
+    def __init__(self, window, max_queries):
+        self.window = window
+        self.max_queries = max_queries
+        self.lock = threading.Lock()
+        self.views = {}
+        self.queries = {}
+
+    def record(self, name, total_ms, timing):
+        with self.lock:
+            samples = self.views.get(name)
+            if samples is None:
+                samples = self.views[name] = deque(maxlen=self.window)
+            samples.append((total_ms, timing.queries, timing.sql_ms))
+
+            for sql, (count, sql_ms, max_ms) in timing.statements.items():
+                query = self.queries.get(sql)
+                if query is None:
+                    if len(self.queries) >= self.max_queries:
+                        lightest = min(self.queries, key=lambda key: self.queries[key]['total_ms'])
+                        if self.queries[lightest]['total_ms'] >= sql_ms:
+                            continue
+                        del self.queries[lightest]
+                    query = self.queries[sql] = {'sql': sql, 'view': name, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+                query['count'] += count
+                query['total_ms'] += sql_ms
+                query['max_ms'] = max(query['max_ms'], max_ms)
+
+    def slowest_views(self, limit=20):
+        """Latency percentiles, SQL averages and histogram of each URL name, slowest p95 first"""
+        with self.lock:
+            views = {name: list(samples) for name, samples in self.views.items()}
+
+        rows = []
+        for name, samples in views.items():
+            timings = sorted(sample[0] for sample in samples)
+            histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+            for total_ms in timings:
+                histogram[next(
+                    (index for index, bound in enumerate(LATENCY_BUCKETS_MS) if total_ms <= bound),
+                    len(LATENCY_BUCKETS_MS),
+                )] += 1
+            rows.append({
+                'name': name,
+                'requests': len(samples),
+                'p50_ms': percentile(timings, 0.5),
+                'p95_ms': percentile(timings, 0.95),
+                'max_ms': timings[-1],
+                'avg_queries': sum(sample[1] for sample in samples) / len(samples),
+                'avg_sql_ms': sum(sample[2] for sample in samples) / len(samples),
+                'histogram': histogram,
+            })
+        rows.sort(key=lambda row: row['p95_ms'], reverse=True)
+        return rows[:limit]
+
+    def heaviest_queries(self, limit=20):
+        """Statements by total database time, heaviest first"""
+        with self.lock:
+            queries = [dict(query) for query in self.queries.values()]
+        for query in queries:
+            query['avg_ms'] = query['total_ms'] / query['count']
+        queries.sort(key=lambda query: query['total_ms'], reverse=True)
+        return queries[:limit]
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+            self.queries.clear()
+
+
+timing_stats = TimingStats(settings.REQUEST_TIMING_WINDOW, settings.REQUEST_TIMING_MAX_QUERIES)
+
+
+class RequestTimingMiddleware:
+    """
+    Measures every request and adds ``Server-Timing: app;dur=…, db;dur=…;desc="N queries"``.
+    Streaming responses are measured up to the start of the stream. With
+    REQUEST_TIMING_ENABLED off the middleware removes itself and costs nothing.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        request_started.connect(install_sql_wrappers, dispatch_uid='sorting.timing')
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timing = RequestTiming()
+        token = current_timing.set(timing)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timing.reset(token)
+        return self.finish(request, response, timing, started)
+
+    async def __acall__(self, request):
+        timing = RequestTiming()
+        token = current_timing.set(timing)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timing.reset(token)
+        return self.finish(request, response, timing, started)
+
+    def finish(self, request, response, timing, started):
+        total_ms = (time.perf_counter() - started) * 1000
+        match = request.resolver_match
+        timing_stats.record(match.view_name if match else 'unresolved', total_ms, timing)
+        response['Server-Timing'] = (
+            f'app;dur={total_ms:.1f}, db;dur={timing.sql_ms:.1f};desc="{timing.queries} queries"'
+        )
+        return response
@@ -5,22 +5,35 @@ app_name = 'sorting'
 
 urlpatterns = [
     path('', views.DashboardView.as_view(), name='dashboard'),
+    path('events/dashboard/', views.DashboardEventsView.as_view(), name='dashboard_events'),
     path('sockets/', views.SocketListView.as_view(), name='socket_list'),
     path('sockets/<int:socket_id>/', views.SocketDetailView.as_view(), name='socket_detail'),
     path('bags/', views.BagListView.as_view(), name='bag_list'),
+    path('bags/more/', views.BagListMoreView.as_view(), name='bag_list_more'),
+    path('bags/export/', views.BagExportView.as_view(), name='bag_export'),
     path('bags/<int:bag_id>/', views.BagDetailView.as_view(), name='bag_detail'),
     path('personnel/', views.PersonnelListView.as_view(), name='personnel_list'),
     path('sorted-bags/', views.SortedBagListView.as_view(), name='sorted_bag_list'),
+    path('sorted-bags/export/', views.SortedBagExportView.as_view(), name='sorted_bag_export'),
     
     # Multi-step bag creation form URLs
     path('add-bag/step1/', views.Step1SocketSelectionView.as_view(), name='step1_socket_selection'),
     path('add-bag/step2/', views.Step2BagTypeSelectionView.as_view(), name='step2_bagtype_selection'),
     path('add-bag/step2b/', views.Step2bSubtypeSelectionView.as_view(), name='step2b_subtype_selection'),
     path('add-bag/step3/', views.Step3WeightEntryView.as_view(), name='step3_weight_entry'),
+    path('add-bag/step3/scale/', views.ScaleReadingView.as_view(), name='scale_reading'),
     path('add-bag/step4/', views.Step4SummaryView.as_view(), name='step4_summary'),
     path('add-bag/continue/', views.ContinueOrFinishView.as_view(), name='continue_or_finish'),
+    path('add-bag/quick/', views.QuickBagEntryView.as_view(), name='quick_bag_entry'),
+    path('add-bag/sw.js', views.BagEntryServiceWorkerView.as_view(), name='bag_entry_sw'),
+    path('api/catalog/', views.CatalogView.as_view(), name='catalog'),
+    
+    # Bulk entry API for scanner and scale stations
+    path('api/bags/bulk/', views.BagBulkCreateView.as_view(), name='bag_bulk_create'),
+    path('api/bags/search/', views.BagSearchView.as_view(), name='bag_search'),
     
     # Settings URLs
     path('settings/', views.SettingsView.as_view(), name='settings'),
     path('settings/update-order/', views.UpdateOrderView.as_view(), name='update_order'),
+    path('performance/', views.PerformanceView.as_view(), name='performance'),
 ]
\ No newline at end of file
@@ -1,15 +1,37 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.contrib.auth.views import redirect_to_login
+from django.core.handlers.asgi import ASGIRequest
 from django.views.generic import ListView, DetailView, TemplateView, FormView
 from django.views import View
 from django.urls import reverse_lazy, reverse
-from django.db.models import Count, Q
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
 from django.core.serializers.json import DjangoJSONEncoder
 from .models import Socket, Bag, SortedBag, SortingPerson, BagType, BagSubtype
-from .forms import SocketSelectionForm, BagTypeSelectionForm, BagSubtypeSelectionForm, WeightForm
-import uuid
+from .forms import SocketSelectionForm, BagTypeSelectionForm, BagSubtypeSelectionForm, WeightForm, BagRecordForm
+from .catalog import get_catalog, bump_catalog_version
+from .bag_ids import assign_bag_ids
+from .wizard import get_wizard_store
+from .scales import consume_reading, pending_reading
+from .idempotency import IdempotencyKeyConflict, InvalidIdempotencyKey, create_bag_once, get_idempotency_key, new_idempotency_key
+from .counters import adjust_dashboard_counters, get_dashboard_counters
+from .rollups import record_bags
+from .search import index_bags, search_bags
+from .exports import ExportMixin
+from .events import dashboard_event_stream
+from .productivity import current_shift, personnel_metrics
+from .pagination import KeysetPaginationMixin, keyset_page
+from .timing import LATENCY_BUCKETS_MS, timing_stats
+from datetime import timedelta
+from urllib.parse import urlencode
 import json
 
 
@@ -18,17 +40,31 @@ class DashboardView(LoginRequiredMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context.update({
-            'total_sockets': Socket.objects.filter(is_active=True).count(),
-            'total_bags': Bag.objects.count(),
-            'processed_bags': Bag.objects.filter(is_processed=True).count(),
-            'pending_bags': Bag.objects.filter(is_processed=False).count(),
-            'sorted_bags': SortedBag.objects.count(),
-            'active_personnel': SortingPerson.objects.all().count(),
-        })
+        context.update(get_dashboard_counters())
         return context
 
 
+class DashboardEventsView(View):
+    """
+    Server-Sent Events with live dashboard counters and new bags. The stream stays open,
+    so it is only served by the ASGI server; under WSGI it answers 204, which tells the
+    browser not to reconnect and leaves the page static.
+    """
+
+    async def get(self, request):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        if not isinstance(request, ASGIRequest):
+            return HttpResponse(status=204)
+
+        response = StreamingHttpResponse(dashboard_event_stream(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Tell nginx to pass events through instead of buffering them
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
 class SocketListView(LoginRequiredMixin, ListView):
     model = Socket
     template_name = 'sorting/socket_list.html'
@@ -44,49 +80,126 @@ class SocketDetailView(LoginRequiredMixin, DetailView):
     model = Socket
     template_name = 'sorting/socket_detail.html'
     pk_url_kwarg = 'socket_id'
+    # Bags per keyset page of the socket history
+    page_size = 50
+
+    def get_days(self):
+        days = self.request.GET.get('days', '')
+        if days.isdigit() and 1 <= int(days) <= 366:
+            return int(days)
+        return settings.SOCKET_HISTORY_DAYS
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['bags'] = self.object.bags.all().order_by('-received_at')
+        days = self.get_days()
+        since = timezone.now() - timedelta(days=days)
+        history = self.object.bags.filter(received_at__gte=since)
+
+        try:
+            bags, next_cursor = keyset_page(
+                history.select_related('bag_type', 'bag_subtype', 'sorting_person'),
+                ('received_at', 'id'),
+                self.request.GET.get('cursor'),
+                self.page_size,
+            )
+        except ValueError:
+            raise Http404('Invalid cursor')
+
+        daily_totals = history.annotate(
+            day=TruncDate('received_at')
+        ).values('day').annotate(
+            bag_count=Count('id'),
+            total_weight=Sum('weight_kg'),
+        ).order_by('-day')
+
+        context.update({
+            'bags': bags,
+            'next_cursor': next_cursor,
+            'daily_totals': daily_totals,
+            'days': days,
+        })
         return context
 
 
-class BagListView(LoginRequiredMixin, ListView):
+class BagListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Bag
     template_name = 'sorting/bag_list.html'
     context_object_name = 'bags'
+    paginate_by = 50
+
+    def get_current_filters(self):
+        bag_type = self.request.GET.get('bag_type')
+        return {
+            'status': self.request.GET.get('status'),
+            'bag_type': bag_type if bag_type and bag_type.isdigit() else None,
+        }
 
     def get_queryset(self):
-        bags = Bag.objects.select_related('socket', 'sorting_person', 'bag_type').order_by('-received_at')
+        bags = Bag.objects.select_related('socket', 'sorting_person', 'bag_type')
+        filters = self.get_current_filters()
         
-        status_filter = self.request.GET.get('status')
-        if status_filter == 'processed':
+        if filters['status'] == 'processed':
             bags = bags.filter(is_processed=True)
-        elif status_filter == 'pending':
+        elif filters['status'] == 'pending':
             bags = bags.filter(is_processed=False)
         
-        bag_type = self.request.GET.get('bag_type')
-        if bag_type:
-            bags = bags.filter(bag_type=bag_type)
+        if filters['bag_type']:
+            bags = bags.filter(bag_type=filters['bag_type'])
         
         return bags
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        current_filters = self.get_current_filters()
         context.update({
-            'bag_types': BagType.objects.all(),
-            'current_filters': {
-                'status': self.request.GET.get('status'),
-                'bag_type': self.request.GET.get('bag_type'),
-            }
+            'bag_types': BagType.objects.order_by('name'),
+            'current_filters': current_filters,
+            'filter_query': urlencode({k: v for k, v in current_filters.items() if v}),
+            'counters': get_dashboard_counters(),
         })
         return context
 
 
+class BagListMoreView(BagListView):
+    """JSON endpoint behind the "load more" button of the bag list"""
+
+    def get_context_data(self, **kwargs):
+        # Only the next page is needed, skip the filter/summary data of the full page
+        return super(BagListView, self).get_context_data(**kwargs)
+
+    def render_to_response(self, context, **response_kwargs):
+        html = render_to_string('sorting/includes/bag_items.html', context, request=self.request)
+        return JsonResponse({'html': html, 'next_cursor': context['next_cursor']})
+
+
+class BagExportView(ExportMixin, BagListView):
+    """CSV/XLSX export of the bag list with its current filters"""
+    export_filename = 'worki'
+    export_columns = (
+        ('ID Worka', lambda bag: bag.bag_id),
+        ('Przyjęto', lambda bag: bag.received_at),
+        ('Gniazdo', lambda bag: bag.socket.socket_id),
+        ('Typ Worka', lambda bag: bag.bag_type.name),
+        ('Podtyp', lambda bag: bag.bag_subtype.name if bag.bag_subtype else ''),
+        ('Parametr', lambda bag: 'Extra' if bag.extra else 'Standard'),
+        ('Waga (kg)', lambda bag: bag.weight_kg),
+        ('Liczba Sztuk', lambda bag: bag.item_count),
+        ('Klasa Jakości', lambda bag: bag.get_quality_grade_display()),
+        ('Sortujący', lambda bag: bag.sorting_person.name if bag.sorting_person else ''),
+        ('Przetworzony', lambda bag: 'Tak' if bag.is_processed else 'Nie'),
+        ('Przetworzono', lambda bag: bag.processed_at),
+        ('Notatki', lambda bag: bag.notes),
+    )
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('bag_subtype')
+
+
 class BagDetailView(LoginRequiredMixin, DetailView):
     model = Bag
     template_name = 'sorting/bag_detail.html'
     pk_url_kwarg = 'bag_id'
+    queryset = Bag.objects.select_related('socket', 'bag_type', 'bag_subtype', 'sorting_person', 'sorted_bag')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -100,45 +213,313 @@ class PersonnelListView(LoginRequiredMixin, ListView):
     context_object_name = 'personnel'
 
     def get_queryset(self):
-        return SortingPerson.objects.annotate(
-            bags_sorted=Count('sorted_bags')
-        ).order_by('name')
+        return SortingPerson.objects.order_by('name')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        metrics = personnel_metrics()
+        for person in context['personnel']:
+            person.metrics = metrics[person.id]
+        context['shift_start'], context['shift_end'] = current_shift()
+        return context
 
 
-class SortedBagListView(LoginRequiredMixin, ListView):
+class SortedBagListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = SortedBag
     template_name = 'sorting/sorted_bag_list.html'
     context_object_name = 'sorted_bags'
+    keyset_fields = ('created_at', 'id')
+
+    def get_current_filters(self):
+        destination = self.request.GET.get('destination')
+        status = self.request.GET.get('status')
+        return {
+            'destination': destination if destination in dict(SortedBag.DESTINATION_CHOICES) else None,
+            'status': status if status in dict(SortedBag.STATUS_CHOICES) else None,
+        }
 
     def get_queryset(self):
-        sorted_bags = SortedBag.objects.select_related('original_bag').order_by('-created_at')
-        
-        destination_filter = self.request.GET.get('destination')
-        if destination_filter:
-            sorted_bags = sorted_bags.filter(destination=destination_filter)
-        
-        status_filter = self.request.GET.get('status')
-        if status_filter:
-            sorted_bags = sorted_bags.filter(status=status_filter)
-        
+        # Everything the rows show, in one joined query
+        sorted_bags = SortedBag.objects.select_related(
+            'original_bag__bag_type', 'original_bag__bag_subtype', 'original_bag__socket'
+        ).order_by('-created_at', '-id')
+        filters = self.get_current_filters()
+
+        if filters['destination']:
+            sorted_bags = sorted_bags.filter(destination=filters['destination'])
+
+        if filters['status']:
+            sorted_bags = sorted_bags.filter(status=filters['status'])
+
         return sorted_bags
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        current_filters = self.get_current_filters()
         context.update({
             'destinations': SortedBag.DESTINATION_CHOICES,
             'statuses': SortedBag.STATUS_CHOICES,
-            'current_filters': {
-                'destination': self.request.GET.get('destination'),
-                'status': self.request.GET.get('status'),
-            }
+            'current_filters': current_filters,
+            'filter_query': urlencode({k: v for k, v in current_filters.items() if v}),
         })
         return context
 
 
+class SortedBagExportView(ExportMixin, SortedBagListView):
+    """CSV/XLSX export of the sorted bag list with its current filters"""
+    export_filename = 'posortowane-worki'
+    export_columns = (
+        ('ID Worka', lambda sorted_bag: sorted_bag.original_bag.bag_id),
+        ('Typ Worka', lambda sorted_bag: sorted_bag.original_bag.bag_type.name),
+        ('Gniazdo', lambda sorted_bag: sorted_bag.original_bag.socket.socket_id),
+        ('Waga (kg)', lambda sorted_bag: sorted_bag.original_bag.weight_kg),
+        ('Miejsce Przeznaczenia', lambda sorted_bag: sorted_bag.get_destination_display()),
+        ('Status', lambda sorted_bag: sorted_bag.get_status_display()),
+        ('Kontrola Jakości', lambda sorted_bag: 'Tak' if sorted_bag.final_quality_check else 'Nie'),
+        ('Numer Przesyłki', lambda sorted_bag: sorted_bag.tracking_number),
+        ('Utworzono', lambda sorted_bag: sorted_bag.created_at),
+        ('Wysłano', lambda sorted_bag: sorted_bag.shipped_at),
+        ('Dostarczono', lambda sorted_bag: sorted_bag.delivered_at),
+    )
+
+
+class BagBulkCreateView(LoginRequiredMixin, View):
+    """
+    JSON batch endpoint for scanner and scale stations. Accepts
+    {"bags": [{"socket", "bag_type", "bag_subtype", "parameter", "weight_kg", "notes", "client_key"}, ...]}
+    (or "socket_id", "bag_type_id", "bag_subtype_id" to give primary keys instead of codes),
+    inserts every valid record in one transaction and reports the outcome of each row.
+    A record whose client_key was stored before is reported as a duplicate of that bag;
+    valid records that could not be stored this time have status "retry" and should be
+    sent again later.
+    """
+
+    def post(self, request):
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid JSON body.'}, status=400)
+
+        records = payload.get('bags') if isinstance(payload, dict) else None
+        if not isinstance(records, list):
+            return JsonResponse({'error': 'Expected a "bags" list.'}, status=400)
+        if len(records) > settings.BULK_BAG_MAX_BATCH:
+            return JsonResponse(
+                {'error': f'At most {settings.BULK_BAG_MAX_BATCH} bags per request.'}, status=400
+            )
+
+        catalog = get_catalog()
+        results, created = save_bag_records(records, catalog)
+        return JsonResponse({
+            'catalog_version': str(catalog.version),
+            'created': created,
+            'duplicates': sum(result['status'] == 'duplicate' for result in results),
+            'failed': sum(result['status'] == 'error' for result in results),
+            'retry': sum(result['status'] == 'retry' for result in results),
+            'results': results,
+        })
+
+
+# Attempts at storing a bulk batch that keeps colliding with concurrent inserts
+STORE_BAGS_ATTEMPTS = 3
+
+
+def save_bag_records(records, catalog):
+    """
+    Validate and store bulk bag ``records`` (dicts of BagRecordForm fields), as the bulk
+    API does for its batches. Returns the result of each record and the number of bags created.
+    """
+    results = []
+    for index, record in enumerate(records):
+        form = BagRecordForm(record if isinstance(record, dict) else {}, catalog=catalog)
+        if not form.is_valid():
+            results.append({'index': index, 'status': 'error', 'errors': form.errors.get_json_data()})
+            continue
+        results.append({'index': index, 'status': 'created', 'bag': form.build_bag()})
+
+    for attempt in range(STORE_BAGS_ATTEMPTS):
+        try:
+            new_bags = store_bags(results)
+            break
+        except IntegrityError:
+            # Another request stored one of the keys (or drew one of the bag IDs) since we
+            # looked; the next attempt sees its bag as a duplicate and draws new IDs
+            continue
+    else:
+        # Still colliding: nothing was stored, so the client has to send these again
+        new_bags = []
+        for result in results:
+            if result['status'] == 'created':
+                del result['bag']
+                result['status'] = 'retry'
+    if new_bags:
+        # bulk_create bypasses the signals that count bags
+        processed = sum(bool(bag.is_processed) for bag in new_bags)
+        adjust_dashboard_counters(
+            total_bags=len(new_bags), processed_bags=processed, pending_bags=len(new_bags) - processed
+        )
+
+    for result in results:
+        if 'bag' in result:
+            bag = result.pop('bag')
+            result.update({'id': bag.id, 'bag_id': bag.bag_id})
+    return results, len(new_bags)
+
+
+def store_bags(results):
+    """
+    Insert the bags of the valid ``results``, except those whose client_key is already
+    stored or repeated earlier in the batch, which point to that bag instead
+    """
+    with transaction.atomic():
+        keys = {result['bag'].client_key for result in results if result.get('bag') and result['bag'].client_key}
+        stored = Bag.objects.in_bulk(keys, field_name='client_key') if keys else {}
+
+        new_bags = []
+        for result in results:
+            bag = result.get('bag')
+            if bag is None:
+                continue
+            if bag.client_key in stored:
+                result.update({'status': 'duplicate', 'bag': stored[bag.client_key]})
+                continue
+            result['status'] = 'created'
+            new_bags.append(bag)
+            if bag.client_key:
+                stored[bag.client_key] = bag
+
+        if new_bags:
+            assign_bag_ids(new_bags)
+            Bag.objects.bulk_create(new_bags)
+            # bulk_create bypasses the post_save signals
+            record_bags(new_bags)
+            index_bags(new_bags, created=True)
+    return new_bags
+
+
+class BagSearchView(LoginRequiredMixin, View):
+    """
+    Ranked search over bag IDs, notes and bag type and subtype names:
+    ?q=<terms>&page=<n>, every term of at least three characters must match.
+    """
+    page_size = 50
+
+    def get(self, request):
+        query = request.GET.get('q', '').strip()
+        try:
+            page = max(1, int(request.GET.get('page', 1)))
+        except ValueError:
+            return JsonResponse({'error': 'Invalid page.'}, status=400)
+
+        bags, has_next = search_bags(query, page, self.page_size)
+        return JsonResponse({
+            'query': query,
+            'page': page,
+            'next_page': page + 1 if has_next else None,
+            'results': [
+                {
+                    'id': bag.id,
+                    'bag_id': bag.bag_id,
+                    'socket': bag.socket.socket_id,
+                    'bag_type': bag.bag_type.name,
+                    'bag_subtype': bag.bag_subtype.name if bag.bag_subtype else None,
+                    'notes': bag.notes,
+                    'is_processed': bag.is_processed,
+                    'received_at': bag.received_at,
+                    'url': reverse('sorting:bag_detail', args=[bag.id]),
+                }
+                for bag in bags
+            ],
+        })
+
+
+class CatalogView(LoginRequiredMixin, View):
+    """The active catalog as one versioned JSON blob; answers 304 while the client's copy is current"""
+
+    def get(self, request):
+        payload = get_catalog().as_payload()
+        etag = f'"{payload["version"]}"'
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponseNotModified()
+        else:
+            response = JsonResponse(payload)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class QuickBagEntryView(LoginRequiredMixin, View):
+    """
+    Single-page bag entry: the catalog is embedded in the page, socket, bag type, subtype
+    and weight are chosen on the client, and each bag costs one POST.
+    """
+    template_name = 'sorting/bag_quick_entry.html'
+
+    def get(self, request):
+        return render(request, self.template_name, {'catalog': get_catalog().as_payload()})
+
+    def post(self, request):
+        try:
+            key = get_idempotency_key(request)
+        except InvalidIdempotencyKey as error:
+            return JsonResponse({'error': str(error)}, status=400)
+
+        form = BagRecordForm(request.POST, catalog=get_catalog())
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+
+        try:
+            bag, created = create_bag_once(key or form.cleaned_data['client_key'] or None, form.build_bag())
+        except IdempotencyKeyConflict as error:
+            return JsonResponse({'error': str(error)}, status=422)
+        return JsonResponse({
+            'id': bag.id,
+            'bag_id': bag.bag_id,
+            'weight_kg': bag.weight_kg,
+            'catalog_version': str(get_catalog().version),
+        }, status=201 if created else 200)
+
+
+class BagEntryServiceWorkerView(View):
+    """
+    Service worker of the quick bag entry page: keeps the page, the catalog and the static
+    assets cached so that the page opens and records bags while the network is down.
+    Served from /add-bag/ rather than /static/ so that its scope covers the page.
+    """
+
+    def get(self, request):
+        response = HttpResponse(
+            render_to_string('sorting/bag_entry_sw.js', request=request), content_type='application/javascript'
+        )
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
 # Multi-step bag creation form views
 
-class Step1SocketSelectionView(LoginRequiredMixin, FormView):
+class BagWizardMixin:
+    """
+    Loads the bag entry wizard state from the configured store (BAG_WIZARD_STORE) into
+    ``self.form_data`` and sends the user back to step 1 if ``required_keys`` are missing.
+    """
+    required_keys = ()
+    missing_state_message = 'Please complete previous steps first.'
+
+    def dispatch(self, request, *args, **kwargs):
+        self.wizard_store = get_wizard_store(request)
+        self.form_data = self.wizard_store.load()
+        if self.required_keys and (
+            self.form_data is None or any(key not in self.form_data for key in self.required_keys)
+        ):
+            messages.error(request, self.missing_state_message)
+            return redirect('sorting:step1_socket_selection')
+        return super().dispatch(request, *args, **kwargs)
+
+    def save_form_data(self):
+        self.wizard_store.save(self.form_data)
+
+
+class Step1SocketSelectionView(LoginRequiredMixin, BagWizardMixin, FormView):
     template_name = 'sorting/bag_form_step1.html'
     form_class = SocketSelectionForm
     success_url = reverse_lazy('sorting:step2_bagtype_selection')
@@ -147,38 +528,33 @@ class Step1SocketSelectionView(LoginRequiredMixin, FormView):
         socket = form.cleaned_data['socket']
         bag_source = form.cleaned_data.get('bag_source')
         
-        session_data = {
+        self.form_data = {
             'socket_id': socket.id,
             'socket_name': socket.socket_name
         }
         
         # Add bag_source if it's provided (for SEP socket)
         if bag_source:
-            session_data['bag_source'] = bag_source
+            self.form_data['bag_source'] = bag_source
         
-        self.request.session['bag_form_data'] = session_data
-        self.request.session.modified = True
+        self.save_form_data()
         return super().form_valid(form)
 
 
-class Step2BagTypeSelectionView(LoginRequiredMixin, View):
+class Step2BagTypeSelectionView(LoginRequiredMixin, BagWizardMixin, View):
     template_name = 'sorting/bag_form_step2.html'
-
-    def dispatch(self, request, *args, **kwargs):
-        if 'bag_form_data' not in request.session:
-            messages.error(request, 'Please start from step 1.')
-            return redirect('sorting:step1_socket_selection')
-        return super().dispatch(request, *args, **kwargs)
+    required_keys = ('socket_id',)
+    missing_state_message = 'Please start from step 1.'
 
     def get(self, request):
-        socket_id = request.session['bag_form_data']['socket_id']
-        bag_source = request.session['bag_form_data'].get('bag_source')
+        socket_id = self.form_data['socket_id']
+        bag_source = self.form_data.get('bag_source')
         form = BagTypeSelectionForm(socket_id=socket_id, bag_source=bag_source)
         return render(request, self.template_name, self.get_context_data(form=form))
 
     def post(self, request):
-        socket_id = request.session['bag_form_data']['socket_id']
-        bag_source = request.session['bag_form_data'].get('bag_source')
+        socket_id = self.form_data['socket_id']
+        bag_source = self.form_data.get('bag_source')
         form = BagTypeSelectionForm(socket_id=socket_id, bag_source=bag_source, data=request.POST)
         
         if form.is_valid():
@@ -197,11 +573,11 @@ class Step2BagTypeSelectionView(LoginRequiredMixin, View):
             else:
                 session_update['bag_type_display'] = bag_type.name
             
-            request.session['bag_form_data'].update(session_update)
-            request.session.modified = True
+            self.form_data.update(session_update)
+            self.save_form_data()
             
             # Check if this bag type has subtypes
-            if bag_type.subtypes.filter(is_active=True).exists():
+            if get_catalog().has_subtypes(bag_type):
                 return redirect('sorting:step2b_subtype_selection')
             else:
                 return redirect('sorting:step3_weight_entry')
@@ -209,12 +585,12 @@ class Step2BagTypeSelectionView(LoginRequiredMixin, View):
         return render(request, self.template_name, self.get_context_data(form=form))
 
     def get_context_data(self, form):
-        socket_name = self.request.session['bag_form_data']['socket_name']
-        bag_source = self.request.session['bag_form_data'].get('bag_source')
+        socket_name = self.form_data['socket_name']
+        bag_source = self.form_data.get('bag_source')
         
         # Get bag type parameters for JavaScript
         bag_type_parameters = {}
-        for bag_type in form.fields['bag_type'].queryset:
+        for bag_type in form.fields['bag_type'].records:
             if bag_type.parameter and isinstance(bag_type.parameter, list) and len(bag_type.parameter) > 1:
                 # Check if it has both Standard and Extra
                 if 'Standard' in bag_type.parameter and 'Extra' in bag_type.parameter:
@@ -236,52 +612,47 @@ class Step2BagTypeSelectionView(LoginRequiredMixin, View):
         return context
 
 
-class Step2bSubtypeSelectionView(LoginRequiredMixin, View):
+class Step2bSubtypeSelectionView(LoginRequiredMixin, BagWizardMixin, View):
     template_name = 'sorting/bag_form_step2b.html'
-
-    def dispatch(self, request, *args, **kwargs):
-        if 'bag_form_data' not in request.session or 'bag_type_id' not in request.session['bag_form_data']:
-            messages.error(request, 'Please complete previous steps first.')
-            return redirect('sorting:step1_socket_selection')
-        return super().dispatch(request, *args, **kwargs)
+    required_keys = ('bag_type_id',)
 
     def get(self, request):
-        bag_type_id = request.session['bag_form_data']['bag_type_id']
+        bag_type_id = self.form_data['bag_type_id']
         form = BagSubtypeSelectionForm(bag_type_id=bag_type_id)
         return render(request, self.template_name, self.get_context_data(form=form))
 
     def post(self, request):
-        bag_type_id = request.session['bag_form_data']['bag_type_id']
+        bag_type_id = self.form_data['bag_type_id']
         form = BagSubtypeSelectionForm(bag_type_id=bag_type_id, data=request.POST)
         
         if form.is_valid():
             bag_subtype = form.cleaned_data['bag_subtype']
             
-            # Update session with subtype information
-            request.session['bag_form_data'].update({
+            # Update wizard state with subtype information
+            self.form_data.update({
                 'bag_subtype_id': bag_subtype.id,
                 'bag_subtype_name': bag_subtype.name
             })
             
             # Update bag_type_display to include subtype
-            bag_type_name = request.session['bag_form_data']['bag_type_name']
-            parameter = request.session['bag_form_data'].get('parameter')
+            bag_type_name = self.form_data['bag_type_name']
+            parameter = self.form_data.get('parameter')
             
             if parameter:
                 display_name = f"{bag_type_name} - {bag_subtype.name} ({parameter})"
             else:
                 display_name = f"{bag_type_name} - {bag_subtype.name}"
             
-            request.session['bag_form_data']['bag_type_display'] = display_name
-            request.session.modified = True
+            self.form_data['bag_type_display'] = display_name
+            self.save_form_data()
             return redirect('sorting:step3_weight_entry')
         
         return render(request, self.template_name, self.get_context_data(form=form))
 
     def get_context_data(self, form):
-        socket_name = self.request.session['bag_form_data']['socket_name']
-        bag_type_name = self.request.session['bag_form_data']['bag_type_name']
-        bag_source = self.request.session['bag_form_data'].get('bag_source')
+        socket_name = self.form_data['socket_name']
+        bag_type_name = self.form_data['bag_type_name']
+        bag_source = self.form_data.get('bag_source')
         
         if bag_source:
             socket_info = f"{socket_name} ({bag_source})"
@@ -295,17 +666,15 @@ class Step2bSubtypeSelectionView(LoginRequiredMixin, View):
         }
 
 
-class Step3WeightEntryView(LoginRequiredMixin, View):
+class Step3WeightEntryView(LoginRequiredMixin, BagWizardMixin, View):
     template_name = 'sorting/bag_form_step3.html'
-
-    def dispatch(self, request, *args, **kwargs):
-        if 'bag_form_data' not in request.session or 'bag_type_id' not in request.session['bag_form_data']:
-            messages.error(request, 'Please complete previous steps first.')
-            return redirect('sorting:step1_socket_selection')
-        return super().dispatch(request, *args, **kwargs)
+    required_keys = ('bag_type_id',)
 
     def get(self, request):
-        form = WeightForm()
+        # A weighing the socket's scale made before the page opened fills the form in
+        reading = pending_reading(self.form_data['socket_id'])
+        initial = {'weight_kg': reading['weight_kg'], 'scale_reading': reading['key']} if reading else {}
+        form = WeightForm(initial=initial)
         return render(request, self.template_name, self.get_context_data(form=form))
 
     def post(self, request):
@@ -313,22 +682,23 @@ class Step3WeightEntryView(LoginRequiredMixin, View):
         if form.is_valid():
             weight_kg = form.cleaned_data['weight_kg']
             notes = form.cleaned_data['notes']
-            request.session['bag_form_data'].update({
+            if form.cleaned_data['scale_reading']:
+                consume_reading(self.form_data['socket_id'], form.cleaned_data['scale_reading'])
+            self.form_data.update({
                 'weight_kg': str(weight_kg),
-                'notes': notes
+                'notes': notes,
+                # Every summary POST for this bag carries it, so a repost returns the same bag
+                'idempotency_key': new_idempotency_key(),
             })
-            request.session.modified = True
+            self.save_form_data()
             return redirect('sorting:step4_summary')
         
         return render(request, self.template_name, self.get_context_data(form=form))
 
     def get_context_data(self, form):
-        bag_type_display = self.request.session['bag_form_data'].get(
-            'bag_type_display', 
-            self.request.session['bag_form_data']['bag_type_name']
-        )
-        socket_name = self.request.session['bag_form_data']['socket_name']
-        bag_source = self.request.session['bag_form_data'].get('bag_source')
+        bag_type_display = self.form_data.get('bag_type_display', self.form_data['bag_type_name'])
+        socket_name = self.form_data['socket_name']
+        bag_source = self.form_data.get('bag_source')
         
         # Create socket_info with bag_source if it exists
         if bag_source:
@@ -344,47 +714,61 @@ class Step3WeightEntryView(LoginRequiredMixin, View):
         }
 
 
-class Step4SummaryView(LoginRequiredMixin, View):
+class ScaleReadingView(LoginRequiredMixin, BagWizardMixin, View):
+    """The weighing the scale of the wizard's socket is offering, polled by the weight step"""
+    required_keys = ('bag_type_id',)
+
+    def get(self, request):
+        return JsonResponse({'reading': pending_reading(self.form_data['socket_id'])})
+
+
+class Step4SummaryView(LoginRequiredMixin, BagWizardMixin, View):
     template_name = 'sorting/bag_form_step4.html'
     continue_template = 'sorting/bag_form_continue.html'
-
-    def dispatch(self, request, *args, **kwargs):
-        if 'bag_form_data' not in request.session or 'weight_kg' not in request.session['bag_form_data']:
-            messages.error(request, 'Please complete previous steps first.')
-            return redirect('sorting:step1_socket_selection')
-        return super().dispatch(request, *args, **kwargs)
+    required_keys = ('weight_kg',)
 
     def get(self, request):
         return render(request, self.template_name, self.get_context_data())
 
     def post(self, request):
-        form_data = request.session['bag_form_data']
+        form_data = self.form_data
+        catalog = get_catalog()
+        try:
+            key = get_idempotency_key(request) or form_data.get('idempotency_key')
+        except InvalidIdempotencyKey as error:
+            return HttpResponseBadRequest(str(error))
         
         # Create the bag entry
-        socket = Socket.objects.get(id=form_data['socket_id'])
-        bag_type = BagType.objects.get(id=form_data['bag_type_id'])
+        socket = catalog.sockets_by_id.get(form_data['socket_id'])
+        bag_type = catalog.bag_types_by_id.get(form_data['bag_type_id'])
         
         # Get subtype if it exists
         bag_subtype = None
         if 'bag_subtype_id' in form_data:
-            bag_subtype = BagSubtype.objects.get(id=form_data['bag_subtype_id'])
+            bag_subtype = catalog.subtypes_by_id.get(form_data['bag_subtype_id'])
         
-        # Generate unique bag ID
-        bag_id = f"BAG_{uuid.uuid4().hex[:8].upper()}"
+        # The selection may have been deactivated since it was made
+        if socket is None or bag_type is None or ('bag_subtype_id' in form_data and bag_subtype is None):
+            messages.error(request, 'The selected socket or bag type is no longer available.')
+            return redirect('sorting:step1_socket_selection')
         
         # Check if Extra parameter was selected
         extra = form_data.get('parameter') == 'Extra'
         
-        bag = Bag.objects.create(
-            bag_id=bag_id,
-            socket=socket,
-            bag_type=bag_type,
-            bag_subtype=bag_subtype,
-            weight_kg=form_data['weight_kg'],
-            notes=form_data['notes'],
-            item_count=1,  # Default to 1 for now
-            extra=extra
-        )
+        try:
+            bag, created = create_bag_once(key, Bag(
+                socket=socket,
+                bag_type=bag_type,
+                bag_subtype=bag_subtype,
+                weight_kg=form_data['weight_kg'],
+                notes=form_data['notes'],
+                item_count=1,  # Default to 1 for now
+                extra=extra
+            ))
+        except IdempotencyKeyConflict as error:
+            return HttpResponse(str(error), status=422)
+        if not created:
+            messages.info(request, f'Bag {bag.bag_id} was already saved.')
         
         # Ask if user wants to add another bag
         return render(request, self.continue_template, {
@@ -393,7 +777,7 @@ class Step4SummaryView(LoginRequiredMixin, View):
         })
 
     def get_context_data(self):
-        form_data = self.request.session['bag_form_data']
+        form_data = self.form_data
         
         # Add socket_info and bag_type_display for display purposes
         bag_source = form_data.get('bag_source')
@@ -415,33 +799,31 @@ class Step4SummaryView(LoginRequiredMixin, View):
         }
 
 
-class ContinueOrFinishView(LoginRequiredMixin, View):
+class ContinueOrFinishView(LoginRequiredMixin, BagWizardMixin, View):
     def post(self, request):
         action = request.POST.get('action')
         
         if action == 'continue_same_socket':
             # Keep socket, go to step 2
-            if 'bag_form_data' in request.session:
+            if self.form_data:
                 # Remove bag-specific data but keep socket
                 socket_data = {
-                    'socket_id': request.session['bag_form_data']['socket_id'],
-                    'socket_name': request.session['bag_form_data']['socket_name']
+                    'socket_id': self.form_data['socket_id'],
+                    'socket_name': self.form_data['socket_name']
                 }
-                if 'bag_source' in request.session['bag_form_data']:
-                    socket_data['bag_source'] = request.session['bag_form_data']['bag_source']
-                request.session['bag_form_data'] = socket_data
+                if 'bag_source' in self.form_data:
+                    socket_data['bag_source'] = self.form_data['bag_source']
+                self.wizard_store.save(socket_data)
             return redirect('sorting:step2_bagtype_selection')
         
         elif action == 'continue_new_socket':
             # Clear all data, start fresh
-            if 'bag_form_data' in request.session:
-                del request.session['bag_form_data']
+            self.wizard_store.clear()
             return redirect('sorting:step1_socket_selection')
         
         else:  # finish
-            # Clear session data
-            if 'bag_form_data' in request.session:
-                del request.session['bag_form_data']
+            # Clear wizard state
+            self.wizard_store.clear()
             messages.info(request, 'Bag entry process completed.')
             return redirect('sorting:bag_list')
     
@@ -456,35 +838,70 @@ class SettingsView(LoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         context.update({
             'sockets': Socket.objects.filter(is_active=True).order_by('order', 'socket_id'),
-            'bag_types': BagType.objects.filter(is_active=True).order_by('order', 'name'),
-            'bag_subtypes': BagSubtype.objects.filter(is_active=True).order_by('bag_type__name', 'order', 'name'),
+            'bag_types': BagType.objects.filter(is_active=True).select_related('socket').order_by('order', 'name'),
+            'bag_subtypes': BagSubtype.objects.filter(is_active=True).select_related('bag_type').order_by(
+                'bag_type__name', 'order', 'name'
+            ),
         })
         return context
 
 
 class UpdateOrderView(LoginRequiredMixin, View):
+    """Applies a drag-and-drop reorder from the settings page as one transactional bulk UPDATE"""
+    orderable_models = {
+        'socket': Socket,
+        'bagtype': BagType,
+        'bagsubtype': BagSubtype,
+    }
+    # Upper bound of the order validators on BagType and BagSubtype
+    ORDER_MAX = 1000
+
     def post(self, request):
-        model_type = request.POST.get('model_type')
-        order_data = request.POST.getlist('order[]')
-        
-        if model_type == 'socket':
-            self._update_socket_order(order_data)
-        elif model_type == 'bagtype':
-            self._update_bagtype_order(order_data)
-        elif model_type == 'bagsubtype':
-            self._update_bagsubtype_order(order_data)
-        
-        messages.success(request, f'{model_type.title()} order updated successfully!')
-        return redirect('sorting:settings')
-    
-    def _update_socket_order(self, order_data):
-        for index, socket_id in enumerate(order_data, 1):
-            Socket.objects.filter(id=socket_id).update(order=index)
-    
-    def _update_bagtype_order(self, order_data):
-        for index, bagtype_id in enumerate(order_data, 1):
-            BagType.objects.filter(id=bagtype_id).update(order=index)
-    
-    def _update_bagsubtype_order(self, order_data):
-        for index, subtype_id in enumerate(order_data, 1):
-            BagSubtype.objects.filter(id=subtype_id).update(order=index)
+        model = self.orderable_models.get(request.POST.get('model_type'))
+        if model is None:
+            return JsonResponse({'error': 'Unknown model type.'}, status=400)
+
+        try:
+            order_data = [int(pk) for pk in request.POST.getlist('order[]')]
+        except ValueError:
+            return JsonResponse({'error': 'Invalid order.'}, status=400)
+        if len(set(order_data)) != len(order_data):
+            return JsonResponse({'error': 'Invalid order.'}, status=400)
+        # bulk_update skips the field validators, which keep order within 1..ORDER_MAX
+        if len(order_data) > self.ORDER_MAX:
+            return JsonResponse({'error': f'At most {self.ORDER_MAX} items can be ordered.'}, status=400)
+
+        now = timezone.now()
+        items = [model(pk=pk, order=index, updated_at=now) for index, pk in enumerate(order_data, 1)]
+        with transaction.atomic():
+            updated = model.objects.bulk_update(items, ['order', 'updated_at'])
+            if updated != len(order_data):
+                # Some ids do not exist; apply all of the order or none of it
+                transaction.set_rollback(True)
+                return JsonResponse({'error': 'Unknown ids in order.'}, status=400)
+        
+        # bulk_update bypasses the post_save signal, so invalidate the catalog once here
+        bump_catalog_version()
+        return JsonResponse({'updated': updated})
+
+
+class PerformanceView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
+    """Slowest endpoints and heaviest queries measured by RequestTimingMiddleware in this process"""
+    template_name = 'sorting/performance.html'
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update({
+            'enabled': settings.REQUEST_TIMING_ENABLED,
+            'views': timing_stats.slowest_views(),
+            'queries': timing_stats.heaviest_queries(),
+            'buckets': [f'≤{bound}' for bound in LATENCY_BUCKETS_MS] + [f'>{LATENCY_BUCKETS_MS[-1]}'],
+        })
+        return context
+
+    def post(self, request):
+        timing_stats.reset()
+        return redirect('sorting:performance')
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+
+WIZARD_SESSION_KEY = 'bag_form_data'
+
+
+class SessionWizardStore:
+    """Keeps the bag entry wizard state in the Django session (one django_session UPDATE per step)"""
+
+    def __init__(self, request):
+        self.request = request
+
+    def load(self):
+        return self.request.session.get(WIZARD_SESSION_KEY)
+
+    def save(self, data):
+        self.request.session[WIZARD_SESSION_KEY] = data
+        self.request.session.modified = True
+
+    def clear(self):
+        self.request.session.pop(WIZARD_SESSION_KEY, None)
+
+
+class CacheWizardStore:
+    """
+    Keeps the bag entry wizard state in the BAG_WIZARD_CACHE cache, keyed by the session
+    key, so stepping through the wizard never writes to the django_session table.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.cache = caches[settings.BAG_WIZARD_CACHE]
+
+    @property
+    def key(self):
+        session = self.request.session
+        if session.session_key is None:
+            session.save()
+        return f'sorting:wizard:{session.session_key}'
+
+    def load(self):
+        return self.cache.get(self.key)
+
+    def save(self, data):
+        self.cache.set(self.key, data, settings.BAG_WIZARD_TTL)
+
+    def clear(self):
+        self.cache.delete(self.key)
+
+
+def get_wizard_store(request):
+    return import_string(settings.BAG_WIZARD_STORE)(request)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -20,10 +21,13 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # See https://docs.djangoproject.com/en/3.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-5$b83gtb@z51%svj&_l1nil(sx^hcq+jm5%u6e7p__(sl)*rw='
+SECRET_KEY = os.environ.get(
+    'SECRET_KEY', 'django-insecure-5$b83gtb@z51%svj&_l1nil(sx^hcq+jm5%u6e7p__(sl)*rw='
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# With DEBUG on Django also keeps every SQL query of a request in memory.
+DEBUG = os.environ.get('DEBUG', 'True').lower() in ('1', 'true', 'yes')
 
 ALLOWED_HOSTS = ['127.0.0.1', 'localhost', 'testserver', '*']
 
@@ -43,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'sorting.timing.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,14 +81,52 @@ WSGI_APPLICATION = 'sortownia.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
-import os
-
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite by default; set DB_ENGINE=postgresql (and the DB_* variables) to use PostgreSQL.
+if os.environ.get('DB_ENGINE') == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'sortownia'),
+            'USER': os.environ.get('DB_USER', 'sortownia'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            # Connections come from a per-process psycopg pool, which replaces CONN_MAX_AGE
+            'CONN_MAX_AGE': 0,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+                    'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 8)),
+                    'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+                },
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            # Keep connections open across requests instead of reconnecting every time
+            'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Seconds a writer waits for the lock before "database is locked"
+                'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)),
+                # Take the write lock when the transaction starts, so two writers queue on
+                # the busy timeout instead of failing while upgrading a read lock
+                'transaction_mode': 'IMMEDIATE',
+                # WAL lets readers run alongside the writer; NORMAL only syncs at checkpoints
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA cache_size=-64000;'
+                    'PRAGMA mmap_size=268435456;'
+                    'PRAGMA temp_store=MEMORY;'
+                ),
+            },
+        }
     }
-}
 
 
 # Password validation
@@ -134,3 +177,88 @@ LOGOUT_REDIRECT_URL = '/'
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Dashboard counters are cached and adjusted in place whenever a Bag/SortedBag changes;
+# they are recomputed after the TTL, which bounds how long changes made outside the ORM, or
+# adjustments lost to concurrent writers (the file cache has no atomic incr), leave them off.
+DASHBOARD_COUNTERS_TTL = int(os.environ.get('DASHBOARD_COUNTERS_TTL', 60))
+
+# Default history window (days) shown on the socket detail page
+SOCKET_HISTORY_DAYS = int(os.environ.get('SOCKET_HISTORY_DAYS', 7))
+
+# Maximum number of bags accepted by one bulk entry API request
+BULK_BAG_MAX_BATCH = int(os.environ.get('BULK_BAG_MAX_BATCH', 500))
+
+# Bag ID generator used by the entry wizard, the bulk API and populate_data.
+# Alternatives: sorting.bag_ids.SocketSequenceBagIdGenerator, sorting.bag_ids.RandomBagIdGenerator
+BAG_ID_GENERATOR = os.environ.get('BAG_ID_GENERATOR', 'sorting.bag_ids.TimeOrderedBagIdGenerator')
+
+# Caches: 'default' holds the dashboard counters and the catalog version, 'wizard' holds
+# the bag entry wizard state and 'idempotency' the idempotency key store. All are file-based
+# so that all worker processes share them; processes in separate containers need CACHE_DIR
+# on a shared volume (docker-compose.yml).
+CACHE_DIR = Path(os.environ.get('CACHE_DIR', '/tmp/sortownia_cache'))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR / 'default',
+    },
+    'wizard': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR / 'wizard',
+    },
+    # One entry per bag saved in the last IDEMPOTENCY_KEY_TTL; a full cache culls a third of
+    # its keys at random, which only sends those retries to the Bag.client_key lookup. Kept
+    # apart so that culling never drops the counters or the catalog version.
+    'idempotency': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR / 'idempotency',
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('IDEMPOTENCY_CACHE_MAX_ENTRIES', 20000))},
+    },
+}
+
+# Where the bag entry wizard keeps its state between steps:
+# sorting.wizard.CacheWizardStore (no django_session writes) or sorting.wizard.SessionWizardStore
+BAG_WIZARD_STORE = os.environ.get('BAG_WIZARD_STORE', 'sorting.wizard.CacheWizardStore')
+BAG_WIZARD_CACHE = 'wizard'
+BAG_WIZARD_TTL = 12 * 60 * 60
+
+# Rows fetched per database round trip by the streaming CSV/XLSX exports
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 2000))
+
+# Live dashboard (Server-Sent Events, served by the ASGI server): seconds between checks
+# for new bags, seconds between keepalive comments, events buffered per slow client and
+# new bags sent per check
+DASHBOARD_EVENTS_POLL_INTERVAL = float(os.environ.get('DASHBOARD_EVENTS_POLL_INTERVAL', 1))
+DASHBOARD_EVENTS_KEEPALIVE = 15
+DASHBOARD_EVENTS_QUEUE_SIZE = 100
+DASHBOARD_EVENTS_MAX_BAGS = 50
+
+# Working shifts (local time) for the personnel productivity figures; a shift may run past midnight
+SORTING_SHIFTS = [('06:00', '14:00'), ('14:00', '22:00'), ('22:00', '06:00')]
+# Bags per hour is only shown once a person has been sorting for this many hours
+PRODUCTIVITY_MIN_HOURS = 0.25
+
+# Weight-scale ingestion (manage.py ingest_scales): a weighing is a load of at least
+# SCALE_MIN_WEIGHT_KG held within SCALE_TOLERANCE_KG for SCALE_SETTLE_SECONDS; the wizard's
+# weight step picks up the weighing of its socket for SCALE_READING_TTL seconds
+SCALE_SETTLE_SECONDS = float(os.environ.get('SCALE_SETTLE_SECONDS', 1.5))
+SCALE_TOLERANCE_KG = os.environ.get('SCALE_TOLERANCE_KG', '0.02')
+SCALE_MIN_WEIGHT_KG = os.environ.get('SCALE_MIN_WEIGHT_KG', '0.5')
+SCALE_READING_TTL = 120
+
+# Seconds the idempotency key store (sorting.idempotency) answers bag creation retries
+# from the cache; older keys are still found through Bag.client_key
+IDEMPOTENCY_CACHE = 'idempotency'
+IDEMPOTENCY_KEY_TTL = 60 * 60
+
+# Bag search (sorting.search): matches ranked per query, newest first; broader queries
+# are only ranked among this many of their newest matches
+BAG_SEARCH_CANDIDATES = int(os.environ.get('BAG_SEARCH_CANDIDATES', 1000))
+
+# Request timing (sorting.timing): Server-Timing headers and the staff performance page.
+# Requests kept per URL name and distinct SQL statements kept per process
+REQUEST_TIMING_ENABLED = os.environ.get('REQUEST_TIMING', 'True').lower() in ('1', 'true', 'yes')
+REQUEST_TIMING_WINDOW = 500
+REQUEST_TIMING_MAX_QUERIES = 200